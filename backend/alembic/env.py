@@ -7,7 +7,7 @@ from alembic import context
 
 from app.core.config import settings
 from app.core.database import Base
-from app.models import User, Profile, Conversation, Goal
+from app.models import User, Profile, Conversation, Message, Goal, LLMUsage
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
@@ -0,0 +1,88 @@
+"""messages table
+
+Moves chat history out of the conversations.messages JSON array into an
+append-only messages table. The backfill runs in batches of conversations,
+each committed on its own, so it can run against a live database and be
+re-run safely if interrupted.
+
+Revision ID: 002
+Revises: ae4be9e4cf1a
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = 'ae4be9e4cf1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    op.create_table(
+        'messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('conversation_id', 'seq', name='uq_messages_conversation_seq')
+    )
+    op.add_column(
+        'conversations',
+        sa.Column('message_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Batched backfill; in autocommit mode every statement commits on its own
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last_id = 0
+        while True:
+            ids = conn.execute(
+                sa.text(
+                    "SELECT id FROM conversations WHERE id > :last_id "
+                    "ORDER BY id LIMIT :batch"
+                ),
+                {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE},
+            ).scalars().all()
+            if not ids:
+                break
+
+            conn.execute(
+                sa.text(
+                    "INSERT INTO messages (conversation_id, seq, role, content, created_at) "
+                    "SELECT c.id, m.ord, COALESCE(m.elem->>'role', 'user'), "
+                    "COALESCE(m.elem->>'content', ''), c.created_at "
+                    "FROM conversations c "
+                    "CROSS JOIN LATERAL json_array_elements(c.messages) "
+                    "WITH ORDINALITY AS m(elem, ord) "
+                    "WHERE c.id = ANY(:ids) "
+                    "ON CONFLICT (conversation_id, seq) DO NOTHING"
+                ),
+                {"ids": list(ids)},
+            )
+            conn.execute(
+                sa.text(
+                    "UPDATE conversations c SET message_count = "
+                    "(SELECT COALESCE(MAX(seq), 0) FROM messages m "
+                    "WHERE m.conversation_id = c.id) "
+                    "WHERE c.id = ANY(:ids)"
+                ),
+                {"ids": list(ids)},
+            )
+            last_id = ids[-1]
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'message_count')
+    op.drop_table('messages')
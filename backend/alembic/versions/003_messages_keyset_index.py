@@ -0,0 +1,33 @@
+"""messages keyset index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so history reads keep working during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_conversation_id_id',
+            'messages',
+            ['conversation_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id_id', table_name='messages')
@@ -0,0 +1,49 @@
+"""llm usage rollups
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('model', sa.String(length=50), nullable=False),
+        sa.Column('purpose', sa.String(length=20), nullable=False),
+        sa.Column('prompt_variant', sa.String(length=20), nullable=False, server_default=''),
+        sa.Column('calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cached_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cost_micro_cny', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('latency_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('ttft_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('streamed_calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', 'model', 'purpose', 'prompt_variant', name='uq_llm_usage_rollup')
+    )
+    op.create_index(op.f('ix_llm_usage_day'), 'llm_usage', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_llm_usage_day'), table_name='llm_usage')
+    op.drop_table('llm_usage')
@@ -1,6 +1,7 @@
 from app.ai.client import get_chat_model, convert_messages
 from app.ai.agent import (
     coaching_agent,
+    coaching_threads,
     chat_with_agent,
     chat_stream_with_agent,
     AgentState
@@ -17,6 +18,7 @@ __all__ = [
     "convert_messages",
     # Agent
     "coaching_agent",
+    "coaching_threads",
     "chat_with_agent",
     "chat_stream_with_agent",
     "AgentState",
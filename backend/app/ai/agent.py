@@ -1,17 +1,36 @@
 # -*- coding: utf-8 -*-
 """LangGraph-based coaching agent for Reborn."""
 
+import logging
+import time
+from contextlib import AsyncExitStack, aclosing
+from dataclasses import dataclass
 from typing import TypedDict, Annotated, AsyncGenerator
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from langgraph.config import get_stream_writer
+from langgraph.graph.message import add_messages, REMOVE_ALL_MESSAGES
+from langchain_core.messages import (
+    HumanMessage, AIMessage, SystemMessage, BaseMessage, RemoveMessage
+)
 
-from app.ai.client import get_chat_model
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.ai.client import get_chat_model, convert_messages
+from app.ai.checkpoint import open_checkpointer
+from app.ai.context import fit_context
+from app.ai.usage import extract_token_usage, record_prompt_cache
+from app.ai.router import RouteDecision, route_turn, record_route, fallback_chain, estimate_cost
+from app.ai.resilience import stream_with_failover, invoke_with_failover
+from app.services.metering import usage_meter
 from app.ai.prompts import (
-    AGENT_SYSTEM_PROMPT,
+    SUMMARY_PROMPT,
+    build_system_prompt,
     build_user_context,
+    build_summary_context,
     extract_insights_from_response,
     clean_insight_markers,
+    InsightMarkerFilter,
 )
 
 
@@ -19,41 +38,156 @@ class AgentState(TypedDict):
     """State for the coaching agent."""
     messages: Annotated[list[BaseMessage], add_messages]
     user_profile: dict
+    summary: str | None
     extracted_insights: list[str]
+    user_id: int | None
+    # Seq of the last message in `messages` (checkpointed threads only)
+    last_seq: int
 
 
-def create_system_message(user_profile: dict) -> SystemMessage:
-    """Create system message with user context."""
-    user_context = build_user_context(user_profile)
-    system_content = AGENT_SYSTEM_PROMPT.format(user_context=user_context)
-    return SystemMessage(content=system_content)
+logger = logging.getLogger(__name__)
 
 
-async def coaching_node(state: AgentState) -> dict:
+def create_system_message(user_profile: dict, summary: str | None = None) -> SystemMessage:
+    """Create system message with user context and conversation summary."""
+    user_context = build_user_context(user_profile) + build_summary_context(summary)
+    stage = user_profile.get("current_stage")
+    return SystemMessage(content=build_system_prompt(user_context, stage))
+
+
+def build_prompt_messages(
+    messages: list[dict],
+    user_profile: dict,
+    summary: str | None = None
+) -> list[BaseMessage]:
     """
-    Main coaching node - generates AI response.
+    Build the model input under the configured prompt-token ceiling.
+
+    Args:
+        messages: Unsummarized history as list of dicts, oldest first
+        user_profile: User's profile data
+        summary: Rolling summary of older turns
+
+    Returns:
+        System message followed by the history that fits the budget
     """
-    model = get_chat_model(streaming=False)
+    base_system = create_system_message(user_profile)
+    window = fit_context(
+        base_system.content,
+        summary,
+        messages,
+        max_prompt_tokens=settings.CONTEXT_MAX_PROMPT_TOKENS,
+        keep_turns=settings.CONTEXT_KEEP_TURNS,
+    )
+    system_msg = (
+        create_system_message(user_profile, window.summary)
+        if window.summary else base_system
+    )
+    return [system_msg] + convert_messages(window.messages)
+
+
+def route_messages(messages: list[dict], user_profile: dict) -> RouteDecision:
+    """Route a turn by its latest user message and the user's stage."""
+    latest = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+    return route_turn(latest.get("content", ""), user_profile.get("current_stage"))
 
-    # Build messages with system prompt
-    system_msg = create_system_message(state.get("user_profile", {}))
-    messages = [system_msg] + state["messages"]
 
-    # Generate response
-    response = await model.ainvoke(messages)
+def _served(decision: RouteDecision, model: str) -> RouteDecision:
+    """The decision as served, marking turns answered by a fallback model."""
+    if model == decision.model:
+        return decision
+    return RouteDecision(model, f"{decision.reason}_failover")
 
-    # Extract insights from response
-    insights = extract_insights_from_response(response.content)
 
-    return {"messages": [response], "extracted_insights": insights}
+def _to_dicts(messages: list[BaseMessage]) -> list[dict]:
+    """Convert LangChain history back to role/content dicts."""
+    roles = {"human": "user", "ai": "assistant"}
+    return [
+        {"role": roles[m.type], "content": m.content}
+        for m in messages if m.type in roles
+    ]
 
 
-def build_coaching_graph() -> StateGraph:
+async def coaching_node(state: AgentState) -> dict:
+    """
+    Main coaching node - generates AI response.
+
+    The reply is always streamed from the model. Cleaned text is written
+    to the graph's custom stream as {"content": ...}, and each insight as
+    {"insight": ...} once its marker closes, so graph.astream(...,
+    stream_mode="custom") serves streaming clients; ainvoke() just
+    collects the result.
+    """
+    history = _to_dicts(state["messages"])
+    user_profile = state.get("user_profile", {})
+    decision = route_messages(history, user_profile)
+
+    # Build messages with system prompt, within the token budget
+    messages = build_prompt_messages(history, user_profile, state.get("summary"))
+
+    # Fails over to faster models if the routed one errors or is slow to start
+    stream = stream_with_failover(
+        lambda model: get_chat_model(model, streaming=True).astream(messages),
+        fallback_chain(decision.model),
+        first_token_timeout=settings.LLM_FIRST_TOKEN_TIMEOUT_SECONDS,
+        total_timeout=settings.LLM_TOTAL_TIMEOUT_SECONDS,
+    )
+
+    # Stream response, filtering insight markers incrementally
+    write = get_stream_writer()
+    marker_filter = InsightMarkerFilter()
+    parts = []
+    start = time.perf_counter()
+    first_token_latency = None
+    usage = None
+    served = decision.model
+    try:
+        # aclosing: cancelling the node also closes the upstream stream
+        async with aclosing(stream):
+            async for served, chunk in stream:
+                chunk_usage = extract_token_usage(chunk)
+                if chunk_usage:
+                    usage = chunk_usage
+                    record_prompt_cache(usage)
+                if chunk.content:
+                    if first_token_latency is None:
+                        first_token_latency = time.perf_counter() - start
+                    parts.append(chunk.content)
+                    found = len(marker_filter.insights)
+                    cleaned = marker_filter.feed(chunk.content)
+                    if cleaned:
+                        write({"content": cleaned})
+                    for insight in marker_filter.insights[found:]:
+                        write({"insight": insight})
+        tail = marker_filter.flush()
+        if tail:
+            write({"content": tail})
+    finally:
+        latency = time.perf_counter() - start
+        cost = record_route(_served(decision, served), latency, first_token_latency, usage)
+        if state.get("user_id") is not None:
+            usage_meter.record(
+                state["user_id"], served, "chat", usage, cost, latency, first_token_latency,
+                prompt_variant=user_profile.get("current_stage"),
+            )
+
+    # Stored as the user saw it, like the reply in the messages table
+    return {
+        "messages": [AIMessage(content=clean_insight_markers("".join(parts)))],
+        "extracted_insights": marker_filter.insights,
+        "last_seq": state.get("last_seq", 0) + 1,
+    }
+
+
+def build_coaching_graph(checkpointer: BaseCheckpointSaver | None = None) -> StateGraph:
     """
     Build the LangGraph for coaching conversations.
 
     Simple graph for MVP:
     START -> coaching_node -> END
+
+    Args:
+        checkpointer: Keeps each thread's state between runs (see CoachingThreads)
     """
     graph = StateGraph(AgentState)
 
@@ -66,16 +200,161 @@ def build_coaching_graph() -> StateGraph:
     # Add edges
     graph.add_edge("coach", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
-# Compiled graph instance
+# Compiled graph instance; stateless, every run gets the full history
 coaching_agent = build_coaching_graph()
 
 
+@dataclass
+class ConversationThread:
+    """A conversation's checkpointed graph thread, as read at the start of a turn."""
+    conversation_id: int
+    last_seq: int  # conversation.message_count before this turn
+    summarized_seq: int
+    max_messages: int  # unsummarized messages kept, as in a history read
+    # Checkpointed history ending at last_seq; None if it must be seeded
+    messages: list[BaseMessage] | None
+
+
+def _thread_config(conversation_id: int) -> dict:
+    return {"configurable": {"thread_id": str(conversation_id)}}
+
+
+class CoachingThreads:
+    """
+    Conversation graph state kept between turns by a LangGraph checkpointer.
+
+    Each conversation is a graph thread (thread_id = conversation id)
+    holding the unsummarized tail of its messages, so a turn only sends
+    the new user message instead of reloading and converting the
+    history. A thread whose last_seq does not match the conversation's
+    message_count (history cleared, a reply saved after a failed run,
+    an expired checkpoint) is reseeded from the messages table.
+    """
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.graph = None
+        self._stack: AsyncExitStack | None = None
+
+    async def start(self) -> None:
+        """Open the checkpointer and compile the checkpointed graph."""
+        if self._stack is not None:
+            return
+        self._stack = AsyncExitStack()
+        saver = await open_checkpointer(self.backend, self._stack)
+        if saver is not None:
+            self.graph = build_coaching_graph(saver)
+
+    async def stop(self) -> None:
+        """Close the checkpointer; turns fall back to the stateless graph."""
+        self.graph = None
+        if self._stack is not None:
+            await self._stack.aclose()
+            self._stack = None
+
+    async def load(
+        self,
+        conversation_id: int,
+        message_count: int,
+        summarized_seq: int,
+        max_messages: int
+    ) -> ConversationThread | None:
+        """
+        Read a conversation's thread for a turn.
+
+        Returns:
+            The thread, with messages=None if it must be seeded from the
+            history; None without a checkpointer or if it cannot be read
+        """
+        if self.graph is None:
+            return None
+        try:
+            snapshot = await self.graph.aget_state(_thread_config(conversation_id))
+        except Exception:
+            metrics.incr("agent_threads.errors")
+            logger.exception("Reading checkpoint of conversation %s failed", conversation_id)
+            return None
+
+        values = snapshot.values
+        current = bool(values) and values.get("last_seq") == message_count
+        metrics.incr("agent_threads.hits" if current else "agent_threads.seeds")
+        return ConversationThread(
+            conversation_id=conversation_id,
+            last_seq=message_count,
+            summarized_seq=summarized_seq,
+            max_messages=max_messages,
+            messages=values["messages"] if current else None,
+        )
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "active": self.graph is not None}
+
+
+coaching_threads = CoachingThreads(settings.AGENT_CHECKPOINTER)
+metrics.register_collector("agent_threads", coaching_threads.stats)
+
+
+def _initial_state(
+    messages: list[dict],
+    user_profile: dict | None,
+    summary: str | None,
+    user_id: int | None
+) -> AgentState:
+    """Graph input for a turn; only user and assistant messages are kept."""
+    return AgentState(
+        messages=convert_messages([m for m in messages if m.get("role") != "system"]),
+        user_profile=user_profile or {},
+        summary=summary,
+        extracted_insights=[],
+        user_id=user_id,
+        last_seq=0
+    )
+
+
+def _thread_input(
+    thread: ConversationThread,
+    messages: list[dict],
+    user_profile: dict | None,
+    summary: str | None,
+    user_id: int | None
+) -> dict:
+    """
+    Graph input for a turn on a checkpointed thread.
+
+    A current thread gets only `messages` (the new user message) plus
+    removals that keep it to the unsummarized tail; one to be seeded is
+    replaced by `messages` (history + user message).
+    """
+    if thread.messages is None:
+        updates = [RemoveMessage(id=REMOVE_ALL_MESSAGES)]
+    else:
+        # Thread messages are contiguous, the last one being seq last_seq
+        first_seq = thread.last_seq - len(thread.messages) + 1
+        keep_from = max(thread.summarized_seq, thread.last_seq - thread.max_messages) + 1
+        updates = [
+            RemoveMessage(id=message.id)
+            for i, message in enumerate(thread.messages)
+            if first_seq + i < keep_from
+        ]
+    updates += convert_messages([m for m in messages if m.get("role") != "system"])
+    return {
+        "messages": updates,
+        "user_profile": user_profile or {},
+        "summary": summary,
+        "extracted_insights": [],
+        "user_id": user_id,
+        "last_seq": thread.last_seq + 1,
+    }
+
+
 async def chat_with_agent(
     messages: list[dict],
-    user_profile: dict | None = None
+    user_profile: dict | None = None,
+    summary: str | None = None,
+    user_id: int | None = None
 ) -> tuple[str, list[str]]:
     """
     Chat with the coaching agent (non-streaming).
@@ -83,29 +362,16 @@ async def chat_with_agent(
     Args:
         messages: Conversation history as list of dicts
         user_profile: User's profile data
+        summary: Rolling summary of turns no longer in `messages`
+        user_id: User the call's token usage is metered to
 
     Returns:
         Tuple of (response_text, extracted_insights)
     """
-    # Convert messages to LangChain format
-    lc_messages = []
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        if role == "user":
-            lc_messages.append(HumanMessage(content=content))
-        elif role == "assistant":
-            lc_messages.append(AIMessage(content=content))
-
-    # Create initial state
-    state = AgentState(
-        messages=lc_messages,
-        user_profile=user_profile or {},
-        extracted_insights=[]
-    )
-
     # Run the graph
-    result = await coaching_agent.ainvoke(state)
+    result = await coaching_agent.ainvoke(
+        _initial_state(messages, user_profile, summary, user_id)
+    )
 
     # Extract response
     if result["messages"]:
@@ -120,39 +386,91 @@ async def chat_with_agent(
 
 async def chat_stream_with_agent(
     messages: list[dict],
-    user_profile: dict | None = None
+    user_profile: dict | None = None,
+    insights: list[str] | None = None,
+    summary: str | None = None,
+    user_id: int | None = None,
+    thread: ConversationThread | None = None
 ) -> AsyncGenerator[str, None]:
     """
     Chat with the coaching agent (streaming).
 
+    Runs the same compiled graph as chat_with_agent and relays the text
+    its nodes write to the custom stream.
+
     Args:
-        messages: Conversation history as list of dicts
+        messages: Conversation history as list of dicts; with a current
+            `thread`, only the new user message
         user_profile: User's profile data
+        insights: Optional list that receives insights as their markers close
+        summary: Rolling summary of turns no longer in `messages`
+        user_id: User the call's token usage is metered to
+        thread: The conversation's checkpointed thread, from coaching_threads.load()
 
     Yields:
         Chunks of the agent's response (with insight markers cleaned)
     """
-    model = get_chat_model(streaming=True)
-
-    # Convert messages to LangChain format
-    lc_messages = []
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
-        if role == "user":
-            lc_messages.append(HumanMessage(content=content))
-        elif role == "assistant":
-            lc_messages.append(AIMessage(content=content))
-
-    # Add system message
-    system_msg = create_system_message(user_profile or {})
-    full_messages = [system_msg] + lc_messages
-
-    # Stream response
-    buffer = ""
-    async for chunk in model.astream(full_messages):
-        if chunk.content:
-            buffer += chunk.content
-            # Stream cleaned content
-            cleaned = clean_insight_markers(buffer)
-            yield cleaned[len(clean_insight_markers(buffer[:len(buffer) - len(chunk.content)])):]
+    graph = coaching_threads.graph if thread is not None else None
+    if graph is not None:
+        stream = graph.astream(
+            _thread_input(thread, messages, user_profile, summary, user_id),
+            _thread_config(thread.conversation_id),
+            stream_mode="custom",
+            durability="exit",
+        )
+    else:
+        stream = coaching_agent.astream(
+            _initial_state(messages, user_profile, summary, user_id),
+            stream_mode="custom",
+        )
+    # aclosing: closing this generator early also cancels the graph run
+    async with aclosing(stream):
+        async for event in stream:
+            if "content" in event:
+                yield event["content"]
+            elif insights is not None:
+                insights.append(event["insight"])
+
+
+async def summarize_conversation(
+    prior_summary: str | None,
+    messages: list[dict],
+    user_id: int | None = None
+) -> tuple[str, list[str]]:
+    """
+    Fold messages into the rolling conversation summary.
+
+    Args:
+        prior_summary: Summary covering everything before `messages`
+        messages: Messages to fold in, oldest first
+        user_id: User the call's token usage is metered to
+
+    Returns:
+        Tuple of (updated summary, insights found in `messages`)
+    """
+    transcript = "\n".join(
+        f"{'用户' if m.get('role') == 'user' else '教练'}：{m.get('content', '')}"
+        for m in messages
+    )
+    prompt = SUMMARY_PROMPT.format(
+        prior_summary=prior_summary or "（无）",
+        transcript=transcript,
+    )
+
+    start = time.perf_counter()
+    served, response = await invoke_with_failover(
+        lambda model: get_chat_model(model, streaming=False, temperature=0.3).ainvoke(
+            [HumanMessage(content=prompt)]
+        ),
+        fallback_chain(settings.SUMMARY_MODEL),
+        settings.LLM_TOTAL_TIMEOUT_SECONDS,
+    )
+    if user_id is not None:
+        usage = extract_token_usage(response)
+        usage_meter.record(
+            user_id, served, "summary", usage, estimate_cost(served, usage),
+            time.perf_counter() - start,
+        )
+
+    raw = response.content
+    return clean_insight_markers(raw), extract_insights_from_response(raw)
@@ -0,0 +1,84 @@
+"""LangGraph checkpointers that keep each conversation's graph state between turns."""
+
+import logging
+from contextlib import AsyncExitStack
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER_BACKENDS = ("none", "memory", "sqlite", "postgres", "redis")
+
+
+def _postgres_url(database_url: str) -> str:
+    """DATABASE_URL for psycopg, which takes no SQLAlchemy driver suffix."""
+    return database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def open_checkpointer(backend: str, stack: AsyncExitStack) -> BaseCheckpointSaver | None:
+    """
+    Open the checkpointer for `backend`; it is closed with `stack`.
+
+    Backends other than memory need their LangGraph package, imported only
+    when selected: langgraph-checkpoint-sqlite (AGENT_CHECKPOINT_SQLITE_PATH),
+    langgraph-checkpoint-postgres with psycopg[pool] (DATABASE_URL) or
+    langgraph-checkpoint-redis (REDIS_URL).
+
+    Args:
+        backend: One of CHECKPOINTER_BACKENDS
+        stack: Owns the checkpointer's connection
+
+    Returns:
+        The checkpointer, or None for "none"
+    """
+    if backend == "none":
+        return None
+
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+
+    if backend == "sqlite":
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        saver = await stack.enter_async_context(
+            AsyncSqliteSaver.from_conn_string(settings.AGENT_CHECKPOINT_SQLITE_PATH)
+        )
+        await saver.setup()
+        return saver
+
+    if backend == "postgres":
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        # A pool, not from_conn_string()'s single connection, so turns of
+        # different users do not queue behind each other's checkpoint I/O
+        pool = AsyncConnectionPool(
+            _postgres_url(settings.DATABASE_URL),
+            min_size=1,
+            max_size=settings.AGENT_CHECKPOINT_POOL_SIZE,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False,
+        )
+        await pool.open()
+        stack.push_async_callback(pool.close)
+        saver = AsyncPostgresSaver(pool)
+        await saver.setup()
+        return saver
+
+    if backend == "redis":
+        from langgraph.checkpoint.redis.aio import AsyncRedisSaver
+        saver = await stack.enter_async_context(
+            AsyncRedisSaver.from_conn_string(
+                settings.REDIS_URL,
+                ttl={
+                    "default_ttl": settings.AGENT_CHECKPOINT_TTL_MINUTES,
+                    "refresh_on_read": True,
+                },
+            )
+        )
+        await saver.asetup()
+        return saver
+
+    raise ValueError(f"Unknown AGENT_CHECKPOINTER {backend!r}, expected one of {CHECKPOINTER_BACKENDS}")
@@ -1,8 +1,115 @@
 """LangChain LLM client configuration for Tongyi (通义千问)."""
 
+import threading
+import requests
+from requests.adapters import HTTPAdapter
 from langchain_community.chat_models import ChatTongyi
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of configured ChatTongyi clients.
+
+    Clients are keyed by (model, streaming, temperature) and all share one
+    keep-alive HTTP session, so turns reuse pooled TLS connections to
+    DashScope instead of opening a new one per request.
+    """
+
+    def __init__(self, pool_connections: int, pool_maxsize: int):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._lock = threading.Lock()
+        self._models: dict[tuple[str, bool, float], ChatTongyi] = {}
+        self._session: requests.Session | None = None
+
+    @property
+    def session(self) -> requests.Session:
+        """Shared HTTP session, created on first use."""
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, model: str, streaming: bool, temperature: float) -> ChatTongyi:
+        """Get the cached client for this configuration, creating it once."""
+        key = (model, streaming, temperature)
+        client = self._models.get(key)
+        if client is not None:
+            metrics.incr("llm.client_cache.hit")
+            return client
+
+        session = self.session
+        with self._lock:
+            client = self._models.get(key)
+            if client is None:
+                metrics.incr("llm.client_cache.miss")
+                client = ChatTongyi(
+                    model=model,
+                    dashscope_api_key=settings.DASHSCOPE_API_KEY,
+                    streaming=streaming,
+                    temperature=temperature,
+                    model_kwargs={"session": session},
+                )
+                self._models[key] = client
+        return client
+
+    def stats(self) -> dict:
+        """Cached clients and per-host connection pool usage."""
+        with self._lock:
+            session = self._session
+            result = {
+                "clients": [
+                    {"model": m, "streaming": s, "temperature": t}
+                    for m, s, t in self._models
+                ],
+                "pools": [],
+            }
+
+        if session is not None:
+            adapter = session.get_adapter("https://")
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                result["pools"].append({
+                    "host": pool.host,
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                    "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                    if pool.pool else 0,
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                })
+
+        return result
+
+    def close(self) -> None:
+        """Drop cached clients and close pooled connections."""
+        with self._lock:
+            session = self._session
+            self._session = None
+            self._models.clear()
+        if session is not None:
+            session.close()
+
+
+model_registry = ModelRegistry(
+    pool_connections=settings.LLM_POOL_CONNECTIONS,
+    pool_maxsize=settings.LLM_POOL_MAXSIZE,
+)
+metrics.register_collector("llm_pool", model_registry.stats)
 
 
 def get_chat_model(
@@ -13,6 +120,8 @@ def get_chat_model(
     """
     Get a configured ChatTongyi model instance.
 
+    Instances are shared across requests through `model_registry`.
+
     Args:
         model: Model name (qwen-turbo, qwen-plus, qwen-max)
         streaming: Whether to enable streaming
@@ -21,12 +130,7 @@ def get_chat_model(
     Returns:
         Configured ChatTongyi instance
     """
-    return ChatTongyi(
-        model=model,
-        dashscope_api_key=settings.DASHSCOPE_API_KEY,
-        streaming=streaming,
-        temperature=temperature,
-    )
+    return model_registry.get(model, streaming, temperature)
 
 
 def convert_messages(messages: list[dict]) -> list:
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Token-budgeted context window for agent prompts."""
+
+import math
+import re
+from dataclasses import dataclass
+
+# CJK ideographs and full-width punctuation; Qwen's tokenizer spends
+# roughly one token on each of these.
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+# Role markers and separators the chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TRUNCATION_MARK = "…"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the Qwen token count of a text without a network call.
+
+    CJK characters count as one token each and other text as one token per
+    four characters, which errs on the high side for typical chat content.
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def count_message_tokens(message: dict) -> int:
+    """Estimate tokens for one {"role", "content"} message."""
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cut text down to roughly `max_tokens`, keeping its head or its tail."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    # Binary search on length; count_tokens is monotonic in prefix length
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        part = text[:mid] if keep == "head" else text[-mid:]
+        if count_tokens(part) + 1 <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    if keep == "head":
+        return text[:lo] + _TRUNCATION_MARK
+    return _TRUNCATION_MARK + text[len(text) - lo:]
+
+
+@dataclass
+class ContextWindow:
+    """Result of fitting a conversation into the prompt budget."""
+    summary: str | None
+    messages: list[dict]
+    prompt_tokens: int
+    dropped: int  # older messages left out of this prompt
+
+
+def _recent_turns(messages: list[dict], keep_turns: int) -> list[dict]:
+    """Last `keep_turns` turns, where a turn starts at a user message."""
+    seen = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            seen += 1
+            if seen == keep_turns:
+                return messages[i:]
+    return messages
+
+
+def fit_context(
+    system_prompt: str,
+    summary: str | None,
+    messages: list[dict],
+    max_prompt_tokens: int,
+    keep_turns: int
+) -> ContextWindow:
+    """
+    Fit summary and history under a hard prompt-token ceiling.
+
+    `messages` is the history not yet folded into `summary`. The last
+    `keep_turns` turns take priority over the summary; messages older than
+    that (waiting to be folded) are sent only while they fit. When the
+    budget is exceeded the summary is shortened first (keeping its most
+    recent part, but never below half the budget), then the oldest
+    messages are dropped. The final message is always kept, truncated if
+    it alone exceeds the budget.
+
+    Args:
+        system_prompt: System prompt without the summary section
+        summary: Rolling summary of older turns, if any
+        messages: Unsummarized history, oldest first
+        max_prompt_tokens: Ceiling for the whole prompt
+        keep_turns: Number of most recent turns to keep verbatim
+
+    Returns:
+        ContextWindow with the summary and messages to send
+    """
+    system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+    budget = max_prompt_tokens - system_tokens
+
+    kept = list(messages)
+    history_tokens = [count_message_tokens(m) for m in kept]
+    recent_tokens = sum(history_tokens[len(kept) - len(_recent_turns(kept, keep_turns)):])
+
+    # The summary's section header is counted like a message's overhead
+    summary_tokens = 0
+    if summary:
+        available = max(budget - recent_tokens, budget // 2) - MESSAGE_OVERHEAD_TOKENS
+        summary = truncate_to_tokens(summary, available, keep="tail")
+        if summary:
+            summary_tokens = count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+    budget -= summary_tokens
+
+    dropped = 0
+    while len(kept) > 1 and sum(history_tokens) > budget:
+        kept.pop(0)
+        history_tokens.pop(0)
+        dropped += 1
+
+    if kept and sum(history_tokens) > budget:
+        last = dict(kept[-1])
+        last["content"] = truncate_to_tokens(
+            last.get("content", ""), budget - MESSAGE_OVERHEAD_TOKENS
+        )
+        kept[-1] = last
+        history_tokens[-1] = count_message_tokens(last)
+
+    return ContextWindow(
+        summary=summary or None,
+        messages=kept,
+        prompt_tokens=system_tokens + summary_tokens + sum(history_tokens),
+        dropped=dropped,
+    )
@@ -18,6 +18,8 @@ Architecture Overview:
 import re
 from typing import Callable
 
+from app.ai.context import count_tokens
+
 
 # =============================================================================
 # IDENTITY MODULE - Who the coach is
@@ -230,28 +232,75 @@ _LANGUAGE_STYLE = """## 语言风格
 # FINAL PROMPT ASSEMBLY
 # =============================================================================
 
-def _build_system_prompt(user_context: str) -> str:
-    """Build the complete system prompt from modules."""
-    modules = [
-        _IDENTITY,
-        _PHILOSOPHY,
-        _CONVERSATION_RULES,
-        _STAGE_FRAMEWORK,
-        _INSIGHT_RULES,
-        _TEMPLATES,
-        _LANGUAGE_STYLE,
-        _QUALITY_CHECKLIST,
-        f"\n## 用户状态\n{user_context}",
-        "\n请用中文回复。",
-    ]
-    return "\n\n".join(modules)
+# The system prompt is laid out as a static prefix followed by the per-user
+# part. The prefix is assembled once at import and is byte-identical for
+# every request, so DashScope can serve it from its prefix cache; anything
+# that varies per user or per turn must go after it.
+
+_LANGUAGE_INSTRUCTION = "请用中文回复。"
+
+
+def _build_static_prefix(modules: list[str]) -> str:
+    """Join static modules into the shared, cacheable prompt prefix."""
+    return "\n\n".join(modules + [_LANGUAGE_INSTRUCTION])
+
+
+def _build_user_section(user_context: str) -> str:
+    """Per-user tail appended after the static prefix."""
+    return f"\n\n## 用户状态\n{user_context}"
+
+
+# Canonical module order; every prompt variant follows it so that the same
+# set of modules always produces the same bytes.
+PROMPT_MODULES: dict[str, str] = {
+    "identity": _IDENTITY,
+    "philosophy": _PHILOSOPHY,
+    "conversation_rules": _CONVERSATION_RULES,
+    "stage_framework": _STAGE_FRAMEWORK,
+    "insight_rules": _INSIGHT_RULES,
+    "templates": _TEMPLATES,
+    "language_style": _LANGUAGE_STYLE,
+    "quality_checklist": _QUALITY_CHECKLIST,
+}
+
+STATIC_SYSTEM_PROMPT = _build_static_prefix(list(PROMPT_MODULES.values()))
 
 
 # =============================================================================
 # PUBLIC API - Functions used by agent.py
 # =============================================================================
 
-AGENT_SYSTEM_PROMPT = _build_system_prompt("{user_context}")
+def build_system_prompt(user_context: str, stage: str | None = None) -> str:
+    """
+    Static prefix followed by the user context block.
+
+    Args:
+        user_context: Per-user context (profile, summary)
+        stage: Profile stage; selects a precompiled slimmer prefix when known
+    """
+    prefix = STAGE_PROMPTS.get(stage, STATIC_SYSTEM_PROMPT)
+    return prefix + _build_user_section(user_context)
+
+
+AGENT_SYSTEM_PROMPT = STATIC_SYSTEM_PROMPT + _build_user_section("{user_context}")
+
+
+SUMMARY_PROMPT = """你在为 Re 成长教练整理与用户的长期对话记忆。
+
+已有摘要：
+{prior_summary}
+
+新增对话：
+{transcript}
+
+请把新增对话合并进已有摘要，输出一份更新后的摘要：
+- 保留用户的具体处境、目标、顾虑、做过的承诺和行动
+- 保留对话推进到了哪个阶段
+- 省略寒暄和重复内容
+- 用第三人称，不超过 300 字
+
+如果新增对话里用户有新的觉察、发现或承诺，在摘要之后每条单独一行标记 `[洞察: xxx]`。
+除摘要和洞察标记外不要输出其他内容。"""
 
 
 FIRST_MESSAGE_PROMPT = """说说看，最近有什么让你觉得"不对劲"的？
@@ -321,6 +370,13 @@ def build_user_context(profile: dict) -> str:
     return "\n".join(parts) if parts else "新用户，暂无信息"
 
 
+def build_summary_context(summary: str | None) -> str:
+    """Format the rolling conversation summary for the user context block."""
+    if not summary:
+        return ""
+    return f"\n\n## 之前的对话摘要\n{summary}"
+
+
 def extract_insights_from_response(response: str) -> list[str]:
     """
     Extract insights from AI response if marked with [洞察: xxx].
@@ -356,6 +412,79 @@ def clean_insight_markers(text: str) -> str:
     return re.sub(r'\[洞察:[^\]]*\]', '', text).strip()
 
 
+_INSIGHT_OPEN = "[洞察:"
+
+
+class InsightMarkerFilter:
+    """
+    Incremental [洞察: xxx] filter for streamed responses.
+
+    Each chunk is scanned once. Text outside markers is returned right away;
+    only a possible marker opening ("[", "[洞", ...) or an unterminated marker
+    is held back until the next chunk decides it. Insights are collected in
+    `insights` as soon as their closing "]" arrives, matching what
+    extract_insights_from_response would return for the full text.
+    """
+
+    def __init__(self):
+        self.insights: list[str] = []
+        self._prefix = ""          # partial match of _INSIGHT_OPEN
+        self._in_marker = False
+        self._body: list[str] = []  # marker text seen so far
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that is safe to show."""
+        out = []
+        i = 0
+        n = len(chunk)
+
+        while i < n:
+            if self._in_marker:
+                end = chunk.find("]", i)
+                if end == -1:
+                    self._body.append(chunk[i:])
+                    break
+                self._body.append(chunk[i:end])
+                insight = "".join(self._body).strip()
+                if insight:
+                    self.insights.append(insight)
+                self._body = []
+                self._in_marker = False
+                i = end + 1
+            elif self._prefix:
+                if chunk[i] == _INSIGHT_OPEN[len(self._prefix)]:
+                    self._prefix += chunk[i]
+                    i += 1
+                    if self._prefix == _INSIGHT_OPEN:
+                        self._prefix = ""
+                        self._in_marker = True
+                else:
+                    # Not a marker after all; "[" only occurs at the start
+                    # of _INSIGHT_OPEN, so chunk[i] can be rescanned as usual
+                    out.append(self._prefix)
+                    self._prefix = ""
+            else:
+                start = chunk.find("[", i)
+                if start == -1:
+                    out.append(chunk[i:])
+                    break
+                out.append(chunk[i:start])
+                self._prefix = "["
+                i = start + 1
+
+        return "".join(out)
+
+    def flush(self) -> str:
+        """Return any held-back text once the stream has ended."""
+        pending = self._prefix
+        if self._in_marker:
+            pending = _INSIGHT_OPEN + "".join(self._body)
+        self._prefix = ""
+        self._in_marker = False
+        self._body = []
+        return pending
+
+
 # =============================================================================
 # REFLECTION QUESTIONS - For reminders and prompts
 # =============================================================================
@@ -393,23 +522,22 @@ INTENTION_QUESTIONS = [
 # CUSTOM PROMPT BUILDER (Optional advanced usage)
 # =============================================================================
 
+# Built prefixes keyed by enabled module set, shared by all builders
+_VARIANT_CACHE: dict[frozenset[str], str] = {}
+
+
 class PromptBuilder:
     """
     Builder for creating customized system prompts.
 
-    Allows selective inclusion of modules for different use cases.
+    Allows selective inclusion of modules for different use cases. Enabled
+    modules are always emitted in PROMPT_MODULES order, and the static part
+    of each variant is built once and memoized by its module set.
     """
 
     def __init__(self):
         self.modules: dict[str, Callable[[], str]] = {
-            "identity": lambda: _IDENTITY,
-            "philosophy": lambda: _PHILOSOPHY,
-            "conversation_rules": lambda: _CONVERSATION_RULES,
-            "stage_framework": lambda: _STAGE_FRAMEWORK,
-            "insight_rules": lambda: _INSIGHT_RULES,
-            "templates": lambda: _TEMPLATES,
-            "language_style": lambda: _LANGUAGE_STYLE,
-            "quality_checklist": lambda: _QUALITY_CHECKLIST,
+            name: (lambda text=text: text) for name, text in PROMPT_MODULES.items()
         }
         self.enabled: set[str] = set(self.modules.keys())
 
@@ -424,9 +552,64 @@ class PromptBuilder:
         self.enabled = set(module_names) & self.modules.keys()
         return self
 
+    def enabled_modules(self) -> list[str]:
+        """Enabled module names in canonical order."""
+        return [name for name in self.modules if name in self.enabled]
+
+    def build_prefix(self) -> str:
+        """Static, cacheable part of the prompt for the enabled modules."""
+        key = frozenset(self.enabled)
+        prefix = _VARIANT_CACHE.get(key)
+        if prefix is None:
+            parts = [self.modules[name]() for name in self.enabled_modules()]
+            prefix = _VARIANT_CACHE[key] = _build_static_prefix(parts)
+        return prefix
+
     def build(self, user_context: str = "{user_context}") -> str:
         """Build the prompt with currently enabled modules."""
-        parts = [self.modules[name]() for name in self.enabled]
-        parts.append(f"\n## 用户状态\n{user_context}")
-        parts.append("\n请用中文回复。")
-        return "\n\n".join(parts)
+        return self.build_prefix() + _build_user_section(user_context)
+
+    def token_report(self) -> dict[str, int]:
+        """
+        Estimated tokens per enabled module.
+
+        Returns:
+            {module_name: tokens, ..., "total": tokens of the whole prefix}
+        """
+        report = {
+            name: count_tokens(self.modules[name]())
+            for name in self.enabled_modules()
+        }
+        report["total"] = count_tokens(self.build_prefix())
+        return report
+
+
+# =============================================================================
+# STAGE VARIANTS - Precompiled prompt per profile stage
+# =============================================================================
+
+# Modules sent for each Profile.current_stage. New users get the full
+# prompt; the stage framework and templates matter less once a user is
+# exploring or has set their vision, so later stages leave them out.
+STAGE_MODULES: dict[str, tuple[str, ...]] = {
+    "new_user": tuple(PROMPT_MODULES),
+    "exploring": tuple(m for m in PROMPT_MODULES if m != "templates"),
+    "established": tuple(
+        m for m in PROMPT_MODULES if m not in ("stage_framework", "templates")
+    ),
+}
+
+STAGE_PROMPTS: dict[str, str] = {
+    stage: PromptBuilder().enable_only(*modules).build_prefix()
+    for stage, modules in STAGE_MODULES.items()
+}
+
+
+def stage_token_report() -> dict[str, dict[str, int]]:
+    """Per-stage prefix tokens and the saving against the full prompt."""
+    full = count_tokens(STATIC_SYSTEM_PROMPT)
+    report = {}
+    for stage, modules in STAGE_MODULES.items():
+        tokens = PromptBuilder().enable_only(*modules).token_report()["total"]
+        report[stage] = {"prefix_tokens": tokens, "saved_tokens": full - tokens}
+    return report
@@ -0,0 +1,246 @@
+"""Deadlines, model failover and circuit breakers for DashScope calls."""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from langchain_core.messages import BaseMessageChunk
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ModelUnavailable(Exception):
+    """Every candidate model is failing (circuit open) or failed for this call."""
+
+
+class DeadlineExceeded(ModelUnavailable):
+    """The model did not answer within its first-token or total deadline."""
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a model that keeps failing, then probes it.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() refuses calls. Once `recovery_time` seconds have passed it is
+    half-open: one probe call is let through, and its outcome closes or
+    re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_time: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now (claims the probe when half-open)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.recovery_time:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self) -> None:
+        """Give back an allowed call whose outcome says nothing (e.g. cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    metrics.incr("llm.breaker.opened")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+class BreakerRegistry:
+    """One circuit breaker per model name."""
+
+    def __init__(self, failure_threshold: int, recovery_time: float):
+        self._failure_threshold = failure_threshold
+        self._recovery_time = recovery_time
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                model, CircuitBreaker(self._failure_threshold, self._recovery_time)
+            )
+        return breaker
+
+    def stats(self) -> dict:
+        return {model: breaker.stats() for model, breaker in self._breakers.items()}
+
+
+breakers = BreakerRegistry(
+    failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+    recovery_time=settings.LLM_BREAKER_RECOVERY_SECONDS,
+)
+metrics.register_collector("circuit_breakers", breakers.stats)
+
+
+def _failed(model: str, error: BaseException) -> None:
+    breakers.get(model).record_failure()
+    kind = "timeouts" if isinstance(error, TimeoutError) else "errors"
+    metrics.incr(f"llm.{model}.{kind}")
+
+
+def _raise_exhausted(models: list[str], last_error: BaseException | None) -> None:
+    if isinstance(last_error, TimeoutError):
+        raise DeadlineExceeded(f"No model answered in time among {models}") from last_error
+    raise ModelUnavailable(f"No model available among {models}") from last_error
+
+
+async def stream_with_failover(
+    open_stream: Callable[[str], AsyncIterator[BaseMessageChunk]],
+    models: list[str],
+    first_token_timeout: float,
+    total_timeout: float
+) -> AsyncIterator[tuple[str, BaseMessageChunk]]:
+    """
+    Stream from the first healthy model, failing over until content arrives.
+
+    Models whose breaker is open are skipped. If a model errors or sends
+    no content within `first_token_timeout`, the next model is tried.
+    Once content has been yielded a failure can no longer be hidden, so
+    it is raised. `total_timeout` bounds the whole call.
+
+    Args:
+        open_stream: Starts a stream for a model name
+        models: Candidates, preferred first
+
+    Yields:
+        (model, chunk) for every chunk of the model that answered
+
+    Raises:
+        DeadlineExceeded: A deadline passed
+        ModelUnavailable: No candidate model could be used
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_timeout
+    last_error: BaseException | None = None
+
+    for model in models:
+        if not breakers.get(model).allow():
+            metrics.incr(f"llm.{model}.short_circuited")
+            continue
+        if last_error is not None:
+            metrics.incr("llm.failovers")
+            logger.warning("Failing over to %s after: %r", model, last_error)
+
+        started = False
+        try:
+            async with aclosing(open_stream(model)) as stream:
+                while True:
+                    remaining = deadline - loop.time()
+                    timeout = remaining if started else min(remaining, first_token_timeout)
+                    try:
+                        async with asyncio.timeout(max(timeout, 0)):
+                            chunk = await anext(stream)
+                    except StopAsyncIteration:
+                        break
+                    started = started or bool(chunk.content)
+                    yield model, chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            # Caller stopped reading: a model that was answering is healthy
+            if started:
+                breakers.get(model).record_success()
+            else:
+                breakers.get(model).release()
+            raise
+        except Exception as e:
+            _failed(model, e)
+            if started or loop.time() >= deadline:
+                if isinstance(e, TimeoutError):
+                    raise DeadlineExceeded(f"{model} timed out") from e
+                raise
+            last_error = e
+            continue
+
+        breakers.get(model).record_success()
+        return
+
+    _raise_exhausted(models, last_error)
+
+
+async def invoke_with_failover(
+    invoke: Callable[[str], Awaitable[T]],
+    models: list[str],
+    total_timeout: float
+) -> tuple[str, T]:
+    """
+    Call the first healthy model, failing over on error or timeout.
+
+    Each attempt gets an equal share of what is left of `total_timeout`
+    among the candidates not yet tried, so a hung model leaves time for
+    the ones after it; the last candidate gets all that is left.
+
+    Returns:
+        Tuple of (model that answered, its result)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_timeout
+    last_error: BaseException | None = None
+
+    for index, model in enumerate(models):
+        if not breakers.get(model).allow():
+            metrics.incr(f"llm.{model}.short_circuited")
+            continue
+        if last_error is not None:
+            metrics.incr("llm.failovers")
+            logger.warning("Failing over to %s after: %r", model, last_error)
+        share = (deadline - loop.time()) / (len(models) - index)
+        try:
+            async with asyncio.timeout(max(share, 0)):
+                result = await invoke(model)
+        except asyncio.CancelledError:
+            breakers.get(model).release()
+            raise
+        except Exception as e:
+            _failed(model, e)
+            if loop.time() >= deadline:
+                raise DeadlineExceeded(f"{model} timed out") from e
+            last_error = e
+            continue
+        breakers.get(model).record_success()
+        return model, result
+
+    _raise_exhausted(models, last_error)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Per-turn model routing between the fast, default and deep chat models."""
+
+import logging
+import re
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# CNY per 1k tokens (input, output), for cost logging only
+MODEL_PRICES = {
+    "qwen-turbo": (0.0003, 0.0006),
+    "qwen-plus": (0.0008, 0.002),
+    "qwen-max": (0.0024, 0.0096),
+}
+
+# Replies that only acknowledge; they need no reasoning
+_ACKNOWLEDGEMENTS = {
+    "好", "好的", "嗯", "嗯嗯", "哦", "行", "可以", "谢谢", "谢啦", "收到",
+    "明白", "知道了", "ok", "okay", "好吧", "哈哈", "是的", "对",
+}
+
+# Self-reflection cues: the turn is likely to produce an [洞察: ...] marker
+_INSIGHT_CUES = re.compile(
+    r"我发现|我意识到|我终于|原来|其实我|我一直|我总是|我害怕|我担心|"
+    r"我想成为|我不想成为|为什么我|我到底|我不知道自己|我的问题"
+)
+
+_TRAILING_PUNCTUATION = "。！？!?.，,~～ "
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Model chosen for a turn, and why (for logs and tuning)."""
+    model: str
+    reason: str
+
+
+def route_turn(message: str, stage: str | None = None) -> RouteDecision:
+    """
+    Pick a model for a user turn with local rules (no network).
+
+    Acknowledgements and short follow-ups of established users go to the
+    fast model; long or self-reflective messages, where an insight is
+    likely to be extracted, go to the deep model; everything else, and
+    every new user's onboarding, to the default model.
+
+    Args:
+        message: The user's message for this turn
+        stage: Profile current_stage
+
+    Returns:
+        RouteDecision with model name and reason
+    """
+    if not settings.ROUTER_ENABLED:
+        return RouteDecision(settings.ROUTER_DEFAULT_MODEL, "disabled")
+
+    text = message.strip()
+    if text.lower().rstrip(_TRAILING_PUNCTUATION) in _ACKNOWLEDGEMENTS:
+        return RouteDecision(settings.ROUTER_FAST_MODEL, "acknowledgement")
+
+    if _INSIGHT_CUES.search(text):
+        return RouteDecision(settings.ROUTER_DEEP_MODEL, "insight_likely")
+    if len(text) >= settings.ROUTER_LONG_MESSAGE_CHARS:
+        return RouteDecision(settings.ROUTER_DEEP_MODEL, "long_message")
+
+    if stage == "new_user":
+        return RouteDecision(settings.ROUTER_DEFAULT_MODEL, "onboarding")
+    if stage == "established" and len(text) <= settings.ROUTER_SHORT_MESSAGE_CHARS:
+        return RouteDecision(settings.ROUTER_FAST_MODEL, "short_followup")
+
+    return RouteDecision(settings.ROUTER_DEFAULT_MODEL, "default")
+
+
+def fallback_chain(model: str) -> list[str]:
+    """`model` followed by the faster routed models to fail over to."""
+    tiers = [
+        settings.ROUTER_DEEP_MODEL,
+        settings.ROUTER_DEFAULT_MODEL,
+        settings.ROUTER_FAST_MODEL,
+    ]
+    faster = tiers[tiers.index(model) + 1:] if model in tiers else [settings.ROUTER_FAST_MODEL]
+    return [model] + [m for m in faster if m != model]
+
+
+def estimate_cost(model: str, usage: dict | None) -> float:
+    """Cost of a call in CNY from its token usage (0 if unknown)."""
+    if not usage or model not in MODEL_PRICES:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[model]
+    return (
+        usage["prompt_tokens"] * input_price
+        + usage["completion_tokens"] * output_price
+    ) / 1000
+
+
+def record_route(
+    decision: RouteDecision,
+    latency: float,
+    first_token_latency: float | None,
+    usage: dict | None
+) -> float:
+    """Log a routed turn and add it to the per-model router metrics; returns its cost."""
+    cost = estimate_cost(decision.model, usage)
+    logger.info(
+        "route model=%s reason=%s latency_ms=%.0f ttft_ms=%s prompt_tokens=%s "
+        "completion_tokens=%s cost_cny=%.6f",
+        decision.model,
+        decision.reason,
+        latency * 1000,
+        f"{first_token_latency * 1000:.0f}" if first_token_latency is not None else "-",
+        usage["prompt_tokens"] if usage else "-",
+        usage["completion_tokens"] if usage else "-",
+        cost,
+    )
+    prefix = f"router.{decision.model}"
+    metrics.incr(f"{prefix}.turns")
+    metrics.incr(f"{prefix}.reason.{decision.reason}")
+    metrics.incr(f"{prefix}.latency_ms", round(latency * 1000))
+    if first_token_latency is not None:
+        metrics.incr(f"{prefix}.ttft_ms", round(first_token_latency * 1000))
+        metrics.incr(f"{prefix}.ttft_samples")
+    metrics.incr(f"{prefix}.cost_micro_cny", round(cost * 1_000_000))
+    return cost
+
+
+def router_stats() -> dict:
+    """Turns, average latency and total cost per routed model."""
+    stats = {}
+    for model in MODEL_PRICES:
+        turns = metrics.get(f"router.{model}.turns")
+        if not turns:
+            continue
+        # Only turns that produced a first token have a TTFT
+        ttft_samples = metrics.get(f"router.{model}.ttft_samples")
+        stats[model] = {
+            "turns": turns,
+            "avg_latency_ms": metrics.get(f"router.{model}.latency_ms") / turns,
+            "avg_ttft_ms": metrics.get(f"router.{model}.ttft_ms") / ttft_samples if ttft_samples else None,
+            "cost_cny": metrics.get(f"router.{model}.cost_micro_cny") / 1_000_000,
+        }
+    return stats
+
+
+metrics.register_collector("model_router", router_stats)
@@ -0,0 +1,54 @@
+"""Token usage reported by DashScope, and prefix-cache accounting."""
+
+from langchain_core.messages import BaseMessage
+from app.core.metrics import metrics
+from app.ai.prompts import stage_token_report
+
+
+def extract_token_usage(message: BaseMessage) -> dict | None:
+    """
+    Read token usage from a model response or final stream chunk.
+
+    Returns:
+        {"prompt_tokens", "completion_tokens", "cached_tokens"} or None if
+        the message carries no usage (intermediate stream chunks)
+    """
+    usage = message.response_metadata.get("token_usage")
+    if not usage:
+        return None
+
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": usage.get("input_tokens", usage.get("prompt_tokens", 0)),
+        "completion_tokens": usage.get("output_tokens", usage.get("completion_tokens", 0)),
+        "cached_tokens": details.get("cached_tokens", 0),
+    }
+
+
+def record_prompt_cache(usage: dict) -> None:
+    """Count prompt tokens and how many of them were served from cache."""
+    metrics.incr("llm.requests")
+    metrics.incr("llm.prompt_tokens", usage["prompt_tokens"])
+    metrics.incr("llm.cached_prompt_tokens", usage["cached_tokens"])
+    if usage["cached_tokens"]:
+        metrics.incr("llm.prompt_cache.hit")
+
+
+_STAGE_PREFIX_TOKENS = {
+    stage: report["prefix_tokens"] for stage, report in stage_token_report().items()
+}
+
+
+def prompt_cache_stats() -> dict:
+    """Prefix-cache hit rate and the share of prompt tokens served from cache."""
+    requests = metrics.get("llm.requests")
+    prompt_tokens = metrics.get("llm.prompt_tokens")
+    cached = metrics.get("llm.cached_prompt_tokens")
+    return {
+        "static_prefix_tokens": _STAGE_PREFIX_TOKENS,
+        "hit_rate": metrics.get("llm.prompt_cache.hit") / requests if requests else 0.0,
+        "cached_token_ratio": cached / prompt_tokens if prompt_tokens else 0.0,
+    }
+
+
+metrics.register_collector("prompt_cache", prompt_cache_stats)
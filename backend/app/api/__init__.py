@@ -1,6 +1,7 @@
+from app.api import admin
 from app.api import auth
 from app.api import chat
 from app.api import profile
 from app.api import reminder
 
-__all__ = ["auth", "chat", "profile", "reminder"]
+__all__ = ["admin", "auth", "chat", "profile", "reminder"]
@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.api.deps import require_admin
+from app.services.metering import get_daily_usage, get_user_usage, usage_day
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/usage")
+async def daily_usage(
+    day: date | None = Query(None, description="Defaults to today"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """Per-user LLM usage and cost for one day, most expensive first."""
+    day = day or usage_day()
+    return {"day": day.isoformat(), "users": await get_daily_usage(db, day, limit)}
+
+
+@router.get("/usage/users/{user_id}")
+async def user_usage(
+    user_id: int,
+    days: int = Query(7, ge=1, le=90),
+    db: AsyncSession = Depends(get_db)
+):
+    """A user's daily LLM usage by model, purpose and prompt variant."""
+    since = usage_day() - timedelta(days=days - 1)
+    return {"user_id": user_id, "days": await get_user_usage(db, user_id, since)}
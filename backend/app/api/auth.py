@@ -3,16 +3,17 @@ from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.config import settings
-from app.services.sms import SMSService
+from app.core.ratelimit import RateLimit, enforce_rate_limit
+from app.services.sms import SMSService, sms_dispatcher
 from app.services.auth import create_access_token, get_or_create_user
+from app.services.verification import code_store
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# In-memory code storage (use Redis in production)
-_verification_codes: dict[str, str] = {}
-
 sms_service = SMSService()
 
+SEND_CODE_PHONE_LIMIT = RateLimit.parse(settings.RATE_LIMIT_SEND_CODE_PHONE)
+
 
 class SendCodeRequest(BaseModel):
     phone: str
@@ -31,9 +32,15 @@ class TokenResponse(BaseModel):
 @router.post("/send-code")
 async def send_code(request: SendCodeRequest):
     """Send verification code to phone number."""
+    # Per-IP limits apply in middleware; this one needs the body
+    await enforce_rate_limit("send_code_phone", request.phone, SEND_CODE_PHONE_LIMIT)
+
     code = sms_service.generate_code()
-    _verification_codes[request.phone] = code
-    await sms_service.send_code(request.phone, code)
+    await code_store.put(request.phone, code)
+
+    # Sent in the background; login latency does not include the SMS provider
+    if not sms_dispatcher.enqueue(request.phone, code):
+        raise HTTPException(status_code=503, detail="SMS service busy, try again later")
 
     # In DEBUG mode, return the code for testing
     if settings.DEBUG:
@@ -45,15 +52,13 @@ async def send_code(request: SendCodeRequest):
 async def verify_code(request: VerifyCodeRequest, db: AsyncSession = Depends(get_db)):
     """Verify code and return access token."""
     # DEV MODE: Skip code verification
-    # stored_code = _verification_codes.get(request.phone)
-    # if not stored_code or stored_code != request.code:
-    #     raise HTTPException(status_code=400, detail="Invalid code")
-    # del _verification_codes[request.phone]
+    if not settings.DEBUG and not await code_store.check(request.phone, request.code):
+        raise HTTPException(status_code=400, detail="Invalid code")
 
     # Get or create user
-    user = await get_or_create_user(db, request.phone)
+    user_id = await get_or_create_user(db, request.phone)
 
     # Generate token
-    token = create_access_token(user.id)
+    token = create_access_token(user_id)
 
     return TokenResponse(access_token=token)
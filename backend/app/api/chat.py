@@ -1,20 +1,32 @@
 # -*- coding: utf-8 -*-
-from fastapi import APIRouter, Depends
+import asyncio
+import math
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.api.deps import get_current_user
-from app.models.user import User
+from app.services.auth import Principal
 from app.services.conversation import (
     get_or_create_conversation,
-    add_message,
-    get_user_profile,
+    load_chat_context,
+    append_message,
+    get_messages,
+    get_messages_page,
     update_user_insights,
     clear_user_conversations,
 )
-from app.ai import chat_stream_with_agent, chat_with_agent, FIRST_MESSAGE_PROMPT
-from app.ai.prompts import extract_insights_from_response, clean_insight_markers
+from app.services.summary import summarizer
+from app.services.write_behind import WriteBehind
+from app.services.turn_lock import turn_locks
+from app.services.admission import admission
+from app.services.metering import within_daily_quota
+from app.api.chat_stream import chat_streams
+from app.core.metrics import metrics
+from app.core.config import settings
+from app.ai import chat_stream_with_agent, chat_with_agent, coaching_threads, FIRST_MESSAGE_PROMPT
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -25,11 +37,12 @@ class ChatRequest(BaseModel):
 
 class ChatHistoryResponse(BaseModel):
     messages: list[dict]
+    has_more: bool = False
 
 
 @router.get("/first-message")
 async def get_first_message(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get the first message for new users."""
@@ -38,62 +51,202 @@ async def get_first_message(
 
 @router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
-    user: User = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    before_id: int | None = Query(None, description="Page of messages older than this id"),
+    after_id: int | None = Query(None, description="Messages newer than this id (since last seen)"),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get current conversation history."""
+    """Get current conversation history, one page at a time."""
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id")
+
     conversation = await get_or_create_conversation(db, user.id)
-    return ChatHistoryResponse(messages=conversation.messages or [])
+    messages, has_more = await get_messages_page(
+        db, conversation.id, limit, before_id=before_id, after_id=after_id
+    )
+    return ChatHistoryResponse(messages=messages, has_more=has_more)
 
 
 @router.post("/send")
 async def send_message(
     request: ChatRequest,
-    user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    raw_request: Request,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
+    user: Principal = Depends(get_current_user),
+    # Closed when this function returns: the reply streams without holding
+    # a pooled connection, and its writes use their own short sessions
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
-    """Send a message and get streaming response."""
-    # Get conversation and profile
-    conversation = await get_or_create_conversation(db, user.id)
-    profile = await get_user_profile(db, user.id)
-
-    # Add user message
-    await add_message(db, conversation, "user", request.message)
-
-    # Prepare messages for AI (include the new message)
-    ai_messages = conversation.messages or []
-
-    async def generate():
-        full_response = ""
+    """
+    Send a message and get streaming response.
+
+    A retry carrying the same Idempotency-Key replays the original reply
+    instead of storing the message and generating again.
+    """
+    user_id = user.id
+
+    # The generation runs independently of this response, so a client whose
+    # connection drops can resume it from GET /chat/stream/{stream_id}
+    stream_id, created = await chat_streams.open(user_id, idempotency_key)
+    if not created:
+        if await chat_streams.buffer.owner(stream_id) != user_id:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key was already processed"
+            )
+        return StreamingResponse(
+            chat_streams.relay(raw_request, stream_id),
+            media_type="text/event-stream",
+            headers={"X-Stream-Id": stream_id},
+        )
+
+    # One turn at a time per user: the history read below must already
+    # contain the previous turn's reply
+    lock_token = await turn_locks.acquire(user_id, settings.TURN_LOCK_WAIT_SECONDS)
+    if lock_token is None:
+        metrics.incr("chat.turn_lock_timeouts")
+        detail = "Previous message is still being answered"
+        await chat_streams.fail(stream_id, user_id, idempotency_key, detail)
+        raise HTTPException(status_code=409, detail=detail)
+
+    admitted = False
+    try:
+        if not await within_daily_quota(db, user_id):
+            raise HTTPException(status_code=429, detail="Daily usage limit reached")
+
+        # Bounded concurrent generations; beyond that, sends wait in a fair
+        # per-user queue
+        admitted = await admission.acquire(user_id)
+        if not admitted:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many replies in progress, try again shortly",
+                headers={"Retry-After": str(math.ceil(admission.max_wait))},
+            )
+
+        # Reads the prompt needs: conversation + profile in one query, then
+        # the unsummarized tail of the history. Older turns are covered by
+        # conversation.summary, so the tail is bounded. A current
+        # checkpointed thread already holds the tail.
+        conversation, profile = await load_chat_context(db, user_id)
+        history_limit = settings.CONTEXT_KEEP_TURNS * 2 + settings.SUMMARY_FOLD_MAX_MESSAGES
+        thread = await coaching_threads.load(
+            conversation.id,
+            conversation.message_count,
+            conversation.summarized_seq,
+            history_limit,
+        )
+        history = []
+        if thread is None or thread.messages is None:
+            history = await get_messages(
+                db,
+                conversation.id,
+                limit=history_limit,
+                after_seq=conversation.summarized_seq,
+            )
+    except BaseException as e:
+        if admitted:
+            admission.release()
+        await turn_locks.release(user_id, lock_token)
+        detail = e.detail if isinstance(e, HTTPException) else "Could not load conversation"
+        await chat_streams.fail(stream_id, user_id, idempotency_key, detail)
+        raise
+
+    ai_messages = history + [{"role": "user", "content": request.message}]
+    summary = conversation.summary
+    conversation_id = conversation.id
+    # Where the next message goes; advanced by each append
+    turn = {"seq": conversation.message_count + 1, "version": conversation.version}
+
+    async def save_message(s: AsyncSession, role: str, content: str) -> None:
+        seq, version = await append_message(
+            s, conversation_id, turn["seq"], turn["version"], role, content
+        )
+        turn["seq"], turn["version"] = seq + 1, version
+
+    # Persist the user message while the model starts generating
+    writes = WriteBehind()
+    writes.submit(lambda s: save_message(s, "user", request.message))
+
+    def save_reply(text: str) -> None:
+        writes.submit(lambda s: save_message(s, "assistant", text))
+
+    async def produce(emit):
         try:
-            async for chunk in chat_stream_with_agent(ai_messages, profile):
-                full_response += chunk
-                yield f"data: {chunk}\n\n"
-
-            # Save assistant response
-            await add_message(db, conversation, "assistant", full_response)
+            await generate_reply(emit)
+        finally:
+            admission.release()
+            await turn_locks.release(user_id, lock_token)
+
+    async def generate_reply(emit):
+        chunks: list[str] = []
+        insights: list[str] = []
+        try:
+            stream = chat_stream_with_agent(
+                ai_messages, profile, insights, summary, user_id=user_id, thread=thread
+            )
+            async with aclosing(stream):
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    await emit(chunk)
+        except BaseException as e:
+            # Nobody is reading any more, or the model failed mid-reply:
+            # upstream generation is already closed; keep whatever was
+            # generated so the turn is not lost
+            if isinstance(e, asyncio.CancelledError):
+                metrics.incr("chat.generations_abandoned")
+            partial = "".join(chunks).strip()
+            if partial:
+                save_reply(partial)
+            await writes.flush()
+            raise
+
+        # Save assistant response
+        save_reply("".join(chunks).strip())
+
+        # Insights were collected while streaming
+        if insights:
+            # Save insights to profile
+            existing_insights = profile.get("key_insights") or []
+            all_insights = list(dict.fromkeys(existing_insights + insights))
+            writes.submit(lambda s: update_user_insights(s, user_id, all_insights[-5:]))  # Keep last 5
+
+        # The turn must be durable before the client is told it is done
+        await writes.flush()
+        summarizer.enqueue(conversation_id)
+
+        await emit("[DONE]")
+
+    await chat_streams.start(stream_id, produce)
+    return StreamingResponse(
+        chat_streams.relay(raw_request, stream_id),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": stream_id},
+    )
 
-            # Extract insights from full response
-            insights = extract_insights_from_response(full_response)
-            if insights:
-                # Save insights to profile
-                existing_insights = profile.key_insights or []
-                all_insights = list(set(existing_insights + insights))
-                await update_user_insights(db, user.id, all_insights[-5:])  # Keep last 5
 
-            yield "data: [DONE]\n\n"
-        except Exception as e:
-            yield f"data: [ERROR] {str(e)}\n\n"
+@router.get("/stream/{stream_id}")
+async def resume_stream(
+    stream_id: str,
+    raw_request: Request,
+    last_event_id: int = Header(0, alias="Last-Event-ID"),
+    user: Principal = Depends(get_current_user)
+):
+    """Resume a reply stream after the last event the client received."""
+    if await chat_streams.buffer.owner(stream_id) != user.id:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
 
     return StreamingResponse(
-        generate(),
-        media_type="text/event-stream"
+        chat_streams.relay(raw_request, stream_id, after_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": stream_id},
     )
 
 
 @router.delete("/history")
 async def clear_history(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Clear all conversation history for the current user."""
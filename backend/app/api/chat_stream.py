@@ -0,0 +1,328 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable
+from fastapi import Request
+from redis.asyncio import Redis
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+from app.services.idempotency import IdempotencyStore, create_idempotency_store
+from app.api.streaming import ClientDisconnected, format_sse, stream_until_disconnect
+
+Emit = Callable[[str], Awaitable[None]]
+
+DONE = "[DONE]"
+ERROR_PREFIX = "[ERROR]"
+
+
+def is_terminal(data: str) -> bool:
+    """Whether an event ends the stream."""
+    return data == DONE or data.startswith(ERROR_PREFIX)
+
+
+class StreamBuffer(ABC):
+    """
+    Short-lived log of a generation's SSE events.
+
+    Events carry ids 1, 2, 3... so a reader can resume after the last id
+    it received. Entries expire STREAM_BUFFER_TTL_SECONDS after the last
+    append.
+    """
+
+    @abstractmethod
+    async def create(self, stream_id: str, owner_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def owner(self, stream_id: str) -> int | None:
+        """User the stream belongs to, or None if unknown/expired."""
+
+    @abstractmethod
+    async def append(self, stream_id: str, event_id: int, data: str) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, stream_id: str, after_id: int) -> AsyncIterator[tuple[int, str]]:
+        """Replay events after `after_id`, then follow new ones until a terminal event."""
+
+    async def has_remote_reader(self, stream_id: str) -> bool:
+        """Whether a reader in another process is attached."""
+        return False
+
+
+class _MemoryStream:
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.events: list[tuple[int, str]] = []
+        self.changed = asyncio.Condition()
+
+
+class InMemoryStreamBuffer(StreamBuffer):
+    """
+    Stream buffer for a single process (tests, one worker).
+
+    Waiting readers re-check every `check_interval` seconds that their
+    entry is still cached; one that was evicted or expired mid-generation
+    gets no more appends, so the reader ends with an [ERROR] event.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000, check_interval: float = 1.0):
+        self._streams: TTLCache[str, _MemoryStream] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._check_interval = check_interval
+
+    async def create(self, stream_id: str, owner_id: int) -> None:
+        self._streams.set(stream_id, _MemoryStream(owner_id))
+
+    async def owner(self, stream_id: str) -> int | None:
+        stream = self._streams.get(stream_id)
+        return stream.owner_id if stream else None
+
+    async def append(self, stream_id: str, event_id: int, data: str) -> None:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return
+        stream.events.append((event_id, data))
+        self._streams.set(stream_id, stream)  # refresh expiry
+        async with stream.changed:
+            stream.changed.notify_all()
+
+    async def read(self, stream_id: str, after_id: int) -> AsyncIterator[tuple[int, str]]:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return
+        index = max(after_id, 0)  # ids are contiguous from 1
+        while True:
+            while index < len(stream.events):
+                event = stream.events[index]
+                index += 1
+                yield event
+                if is_terminal(event[1]):
+                    return
+            async with stream.changed:
+                try:
+                    async with asyncio.timeout(self._check_interval):
+                        await stream.changed.wait_for(lambda: index < len(stream.events))
+                except TimeoutError:
+                    pass
+            if index >= len(stream.events) and self._streams.get(stream_id) is not stream:
+                yield index + 1, f"{ERROR_PREFIX} stream expired"
+                return
+
+
+class RedisStreamBuffer(StreamBuffer):
+    """
+    Stream buffer in a Redis stream, shared by all workers.
+
+    Event n is stored with stream entry id 0-n, so XREAD from 0-<last id>
+    resumes exactly after the last event a client saw.
+    """
+
+    def __init__(self, redis: Redis, ttl: int, block_ms: int):
+        self._redis = redis
+        self._ttl = ttl
+        self._block_ms = block_ms
+
+    @staticmethod
+    def _key(stream_id: str) -> str:
+        return f"chat:stream:{stream_id}"
+
+    async def create(self, stream_id: str, owner_id: int) -> None:
+        await self._redis.set(f"{self._key(stream_id)}:owner", owner_id, ex=self._ttl)
+
+    async def owner(self, stream_id: str) -> int | None:
+        owner = await self._redis.get(f"{self._key(stream_id)}:owner")
+        return int(owner) if owner is not None else None
+
+    async def append(self, stream_id: str, event_id: int, data: str) -> None:
+        key = self._key(stream_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"d": data}, id=f"0-{event_id}")
+            pipe.expire(key, self._ttl)
+            pipe.expire(f"{key}:owner", self._ttl)
+            await pipe.execute()
+
+    async def read(self, stream_id: str, after_id: int) -> AsyncIterator[tuple[int, str]]:
+        key = self._key(stream_id)
+        last = f"0-{max(after_id, 0)}"
+        while True:
+            # Mark this stream as watched so its generation is kept alive
+            await self._redis.set(f"{key}:reader", 1, px=self._block_ms * 3)
+            response = await self._redis.xread({key: last}, block=self._block_ms)
+            if not response:
+                if not await self._redis.exists(f"{key}:owner"):
+                    return  # expired, or the producing worker died
+                continue
+            for entry_id, fields in response[0][1]:
+                last = entry_id
+                event = (int(entry_id.split("-")[1]), fields["d"])
+                yield event
+                if is_terminal(event[1]):
+                    return
+
+    async def has_remote_reader(self, stream_id: str) -> bool:
+        return bool(await self._redis.exists(f"{self._key(stream_id)}:reader"))
+
+
+def create_stream_buffer() -> StreamBuffer:
+    """Redis-backed buffer when Redis is enabled, in-process otherwise."""
+    redis = get_redis()
+    if redis is not None:
+        return RedisStreamBuffer(
+            redis,
+            ttl=settings.STREAM_BUFFER_TTL_SECONDS,
+            block_ms=int(settings.SSE_DISCONNECT_POLL_SECONDS * 1000),
+        )
+    return InMemoryStreamBuffer(
+        ttl=settings.STREAM_BUFFER_TTL_SECONDS,
+        check_interval=settings.SSE_DISCONNECT_POLL_SECONDS,
+    )
+
+
+class ChatStreams:
+    """
+    Runs chat generations in the background and relays them over SSE.
+
+    A generation is decoupled from the HTTP response that started it: its
+    events go to the stream buffer, and any number of readers (the
+    original response, or a resume after a dropped connection) replay and
+    follow them. A generation with no reader for `grace` seconds is
+    cancelled, so abandoned requests stop paying for upstream tokens. A
+    send retried with the same idempotency key attaches to the original
+    stream instead of generating a second reply.
+    """
+
+    def __init__(
+        self,
+        buffer: StreamBuffer,
+        keys: IdempotencyStore,
+        grace: float,
+        poll_interval: float
+    ):
+        self.buffer = buffer
+        self.keys = keys
+        self._grace = grace
+        self._poll_interval = poll_interval
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._readers: dict[str, int] = {}
+
+    async def open(self, owner_id: int, idempotency_key: str | None = None) -> tuple[str, bool]:
+        """
+        Create a stream for a new generation, or find the one for a retry.
+
+        Returns (stream_id, created). When `idempotency_key` was already
+        used by this owner, created is False and stream_id is the stream
+        of the original request; the caller must then relay it instead of
+        generating again. Keys expire with the buffer TTL, counted from the
+        claim, so the stream of a recognised key outlives the key.
+        """
+        stream_id = uuid.uuid4().hex
+        if idempotency_key is not None:
+            existing = await self.keys.claim(f"{owner_id}:{idempotency_key}", stream_id)
+            if existing is not None:
+                return existing, False
+        await self.buffer.create(stream_id, owner_id)
+        return stream_id, True
+
+    async def fail(
+        self,
+        stream_id: str,
+        owner_id: int,
+        idempotency_key: str | None,
+        detail: str
+    ) -> None:
+        """
+        End an opened stream whose generation could not be started.
+
+        Readers already attached get an [ERROR] event, and the idempotency
+        key is freed so that a retry is treated as a new request.
+        """
+        await self.buffer.append(stream_id, 1, f"{ERROR_PREFIX} {detail}")
+        if idempotency_key is not None:
+            await self.keys.release(f"{owner_id}:{idempotency_key}", stream_id)
+
+    async def start(self, stream_id: str, produce: Callable[[Emit], Awaitable[None]]) -> None:
+        """
+        Start `produce(emit)` as the generation behind an opened stream.
+
+        `produce` emits the event payloads and ends with [DONE]; if it
+        raises or is cancelled an [ERROR] event ends the stream instead.
+        """
+        task = asyncio.create_task(self._run(stream_id, produce))
+        self._tasks[stream_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(stream_id, None))
+
+    async def _run(self, stream_id: str, produce: Callable[[Emit], Awaitable[None]]) -> None:
+        event_id = 0
+
+        async def emit(data: str) -> None:
+            nonlocal event_id
+            event_id += 1
+            await self.buffer.append(stream_id, event_id, data)
+
+        watchdog = asyncio.create_task(self._watch(stream_id, asyncio.current_task()))
+        try:
+            await produce(emit)
+        except asyncio.CancelledError:
+            # Readers must not wait on a generation that will never finish
+            await emit(f"{ERROR_PREFIX} generation cancelled")
+            raise
+        except Exception as e:
+            await emit(f"{ERROR_PREFIX} {str(e)}")
+        finally:
+            watchdog.cancel()
+
+    async def _watch(self, stream_id: str, task: asyncio.Task) -> None:
+        """Cancel the generation once nobody has been reading for `grace`."""
+        loop = asyncio.get_running_loop()
+        unwatched_since = None
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            if self._readers.get(stream_id) or await self.buffer.has_remote_reader(stream_id):
+                unwatched_since = None
+            elif unwatched_since is None:
+                unwatched_since = loop.time()
+            elif loop.time() - unwatched_since >= self._grace:
+                task.cancel()
+                return
+
+    async def relay(self, request: Request, stream_id: str, after_id: int = 0) -> AsyncIterator[str]:
+        """SSE frames for events after `after_id`, until the stream ends or the client leaves."""
+        self._readers[stream_id] = self._readers.get(stream_id, 0) + 1
+        try:
+            events = stream_until_disconnect(
+                request, self.buffer.read(stream_id, after_id), self._poll_interval
+            )
+            async with aclosing(events):
+                async for event_id, data in events:
+                    yield format_sse(event_id, data)
+        except ClientDisconnected:
+            return
+        finally:
+            self._readers[stream_id] -= 1
+            if not self._readers[stream_id]:
+                del self._readers[stream_id]
+
+    async def shutdown(self) -> None:
+        """Cancel generations still running in this process."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "readers": sum(self._readers.values()),
+        }
+
+
+chat_streams = ChatStreams(
+    create_stream_buffer(),
+    create_idempotency_store(),
+    grace=settings.SSE_RESUME_GRACE_SECONDS,
+    poll_interval=settings.SSE_DISCONNECT_POLL_SECONDS,
+)
+metrics.register_collector("chat_streams", chat_streams.stats)
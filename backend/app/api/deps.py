@@ -1,29 +1,39 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import Scope
 from sqlalchemy import select
-from app.core.database import get_db
-from app.services.auth import verify_token
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.ratelimit import client_ip
+from app.services.auth import Principal, decode_token, principal_cache
 from app.models.user import User
 
 security = HTTPBearer()
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
     token = credentials.credentials
-    user_id = verify_token(token)
 
-    if not user_id:
+    # Recently verified tokens skip both JWT decoding and the users lookup
+    principal = principal_cache.get(token)
+    if principal:
+        return principal
+
+    payload = decode_token(token)
+    if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # Own short session: the request's session may be held for a long
+    # response, this lookup should not be
+    async with async_session() as db:
+        result = await db.execute(select(User).where(User.id == int(payload["sub"])))
+        user = result.scalar_one_or_none()
 
     if not user:
         raise HTTPException(
@@ -31,4 +41,37 @@ async def get_current_user(
             detail="User not found"
         )
 
-    return user
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is deactivated"
+        )
+
+    principal = Principal.from_user(user)
+    principal_cache.set(token, principal, payload["exp"])
+    return principal
+
+
+async def require_admin(x_admin_key: str | None = Header(None)) -> None:
+    """Admin endpoints need X-Admin-Key; they do not exist without ADMIN_API_KEY."""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
+
+
+def user_rate_limit_key(scope: Scope) -> str | None:
+    """Rate limit authenticated routes per user; per IP without a valid token."""
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode()
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        principal = principal_cache.get(token)
+        if principal:
+            return f"user:{principal.id}"
+        payload = decode_token(token)
+        if payload:
+            return f"user:{payload['sub']}"
+    return f"ip:{client_ip(scope)}"
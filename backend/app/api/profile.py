@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.core.database import get_db
 from app.api.deps import get_current_user
-from app.models.user import User
+from app.services.auth import Principal
 from app.models.profile import Profile
 
 router = APIRouter(prefix="/profile", tags=["profile"])
@@ -27,7 +27,7 @@ class ProfileUpdateRequest(BaseModel):
 
 @router.get("", response_model=ProfileResponse)
 async def get_profile(
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get user profile."""
@@ -57,7 +57,7 @@ async def get_profile(
 @router.put("")
 async def update_profile(
     request: ProfileUpdateRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Update user profile."""
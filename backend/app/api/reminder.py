@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from datetime import datetime
 from app.api.deps import get_current_user
-from app.models.user import User
+from app.services.auth import Principal
 from app.services.reminder import ReminderService
 
 router = APIRouter(prefix="/reminder", tags=["reminder"])
@@ -22,7 +22,7 @@ class ScheduleResponse(BaseModel):
 
 
 @router.get("/question")
-async def get_random_question(user: User = Depends(get_current_user)):
+async def get_random_question(user: Principal = Depends(get_current_user)):
     """Get a random reflection question."""
     question = reminder_service.get_random_question()
     return {"question": question}
@@ -31,7 +31,7 @@ async def get_random_question(user: User = Depends(get_current_user)):
 @router.post("/schedule", response_model=list[ScheduleResponse])
 async def generate_schedule(
     settings: ReminderSettings,
-    user: User = Depends(get_current_user)
+    user: Principal = Depends(get_current_user)
 ):
     """Generate today's reminder schedule."""
     schedule = reminder_service.generate_daily_schedule(
@@ -0,0 +1,59 @@
+import asyncio
+from typing import AsyncIterator, TypeVar
+from fastapi import Request
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The SSE client went away before the stream finished."""
+
+
+def format_sse(event_id: int, data: str) -> str:
+    """Encode one SSE event; multi-line data becomes one data: line per line."""
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"id: {event_id}\n{lines}\n"
+
+
+async def stream_until_disconnect(
+    request: Request,
+    stream: AsyncIterator[T],
+    poll_interval: float
+) -> AsyncIterator[T]:
+    """
+    Relay `stream`, aborting it within `poll_interval` of a client disconnect.
+
+    Waiting for the next chunk is interrupted every `poll_interval` seconds
+    to check the connection, so a stalled upstream is abandoned as quickly
+    as a fast one. On disconnect the pending read is cancelled, `stream` is
+    closed (which closes the upstream model stream) and ClientDisconnected
+    is raised.
+    """
+    pending: asyncio.Future | None = None
+    loop = asyncio.get_running_loop()
+    last_check = loop.time()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(stream))
+
+            done, _ = await asyncio.wait({pending}, timeout=poll_interval)
+            if loop.time() - last_check >= poll_interval:
+                last_check = loop.time()
+                if await request.is_disconnected():
+                    raise ClientDisconnected()
+            if not done:
+                continue
+
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield chunk
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await stream.aclose()
@@ -12,13 +12,80 @@ class Settings(BaseSettings):
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_ENABLED: bool = False  # share state across workers; in-process otherwise
 
     # AI
     DASHSCOPE_API_KEY: str = ""
+    LLM_POOL_CONNECTIONS: int = 4  # distinct hosts kept in the pool
+    LLM_POOL_MAXSIZE: int = 32  # keep-alive connections per host
+
+    # Context window
+    CONTEXT_MAX_PROMPT_TOKENS: int = 6000  # hard ceiling per request
+    CONTEXT_KEEP_TURNS: int = 6  # recent turns always sent verbatim
+    SUMMARY_MODEL: str = "qwen-turbo"
+    SUMMARY_FOLD_MIN_MESSAGES: int = 8  # fold once this many fall outside the window
+    SUMMARY_FOLD_MAX_MESSAGES: int = 40  # messages summarized per LLM call
+    SUMMARY_WORKERS: int = 2  # concurrent summarization jobs
+    SUMMARY_QUEUE_SIZE: int = 1000
+    SUMMARY_SWEEP_INTERVAL_SECONDS: float = 60
+
+    # Model routing
+    ROUTER_ENABLED: bool = True  # pick turbo/plus/max per turn; ROUTER_DEFAULT_MODEL for all turns otherwise
+    ROUTER_FAST_MODEL: str = "qwen-turbo"
+    ROUTER_DEFAULT_MODEL: str = "qwen-plus"
+    ROUTER_DEEP_MODEL: str = "qwen-max"
+    ROUTER_SHORT_MESSAGE_CHARS: int = 12  # established users' short follow-ups go fast
+    ROUTER_LONG_MESSAGE_CHARS: int = 200  # long messages go deep
+
+    # Model resilience
+    LLM_FIRST_TOKEN_TIMEOUT_SECONDS: float = 10.0  # fail over to a faster model after this
+    LLM_TOTAL_TIMEOUT_SECONDS: float = 90.0  # whole call, including failover
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures that open a model's breaker
+    LLM_BREAKER_RECOVERY_SECONDS: float = 30.0  # open breaker lets a probe through after this
+
+    # Agent checkpointer
+    AGENT_CHECKPOINTER: str = "none"  # none | memory (single worker) | sqlite | postgres | redis
+    AGENT_CHECKPOINT_SQLITE_PATH: str = "checkpoints.sqlite"
+    AGENT_CHECKPOINT_POOL_SIZE: int = 10  # postgres only; connections per worker
+    AGENT_CHECKPOINT_TTL_MINUTES: int = 60 * 24 * 30  # redis only; idle threads are reseeded from the DB
+
+    # Usage metering
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 10.0  # usage rollups are written this often
+    USAGE_FLUSH_MAX_KEYS: int = 500  # or as soon as this many are pending
+    USAGE_DAY_TIMEZONE: str = "Asia/Shanghai"  # day boundary for rollups and quotas
+    USAGE_DAILY_TOKEN_QUOTA: int = 0  # per user; 0 = unlimited
+
+    # Streaming
+    SSE_DISCONNECT_POLL_SECONDS: float = 1.0  # how often readers check their connection
+    SSE_RESUME_GRACE_SECONDS: float = 15.0  # generation survives this long without a reader
+    STREAM_BUFFER_TTL_SECONDS: int = 300  # replay window for resumed streams and repeated sends
+    TURN_LOCK_WAIT_SECONDS: float = 10.0  # a send waits this long for the user's previous turn
+    TURN_LOCK_TTL_SECONDS: float = 300.0  # Redis turn lock expiry, in case a worker dies
+    CHAT_MAX_CONCURRENT_GENERATIONS: int = 64  # per worker
+    CHAT_ADMISSION_MAX_WAIT_SECONDS: float = 10.0  # queued sends beyond this get 503
 
     # Auth
+    ADMIN_API_KEY: str = ""  # X-Admin-Key for /api/admin; empty disables admin endpoints
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    PRINCIPAL_CACHE_SIZE: int = 10000  # verified tokens kept per worker
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60  # max staleness of a cached user (other workers)
+    VERIFICATION_CODE_TTL_SECONDS: int = 300  # SMS codes expire after 5 minutes
+    VERIFICATION_MAX_ATTEMPTS: int = 5  # Wrong guesses before a sent code is invalidated
+
+    # Rate limits, "<count>/<second|minute|hour|day>"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_SEND_CODE: str = "5/minute"  # per IP
+    RATE_LIMIT_SEND_CODE_PHONE: str = "1/minute"  # per phone
+    RATE_LIMIT_VERIFY_CODE: str = "10/minute"  # per IP
+    RATE_LIMIT_CHAT_SEND: str = "20/minute"  # per user
+
+    # SMS
+    SMS_PROVIDER: str = "log"  # log, fake
+    SMS_WORKERS: int = 4
+    SMS_QUEUE_SIZE: int = 10000
+    SMS_MAX_RETRIES: int = 3
+    SMS_RETRY_BACKOFF_SECONDS: float = 1.0  # doubled on each retry
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,45 @@
+"""In-process metrics, exposed as JSON at /metrics."""
+
+import threading
+from collections import defaultdict
+from typing import Callable
+
+
+class Metrics:
+    """
+    Minimal metrics registry.
+
+    Counters are incremented by the code paths being measured; collectors
+    are callables that report current state (pool sizes, queue depths...)
+    and are evaluated on every snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = defaultdict(int)
+        self._collectors: dict[str, Callable[[], dict]] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """Current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def register_collector(self, name: str, collector: Callable[[], dict]) -> None:
+        """Register a callable whose result is reported under `name`."""
+        self._collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        """Current counters plus the output of every collector."""
+        with self._lock:
+            result = {"counters": dict(self._counters)}
+        for name, collector in self._collectors.items():
+            result[name] = collector()
+        return result
+
+
+metrics = Metrics()
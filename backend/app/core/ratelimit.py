@@ -0,0 +1,187 @@
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from redis.asyncio import Redis
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Refill the bucket for the time since its last use, then try to take one
+# token. Returns 0 if allowed, else milliseconds until a token is available.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_ms = tonumber(ARGV[2])
+local now = redis.call("TIME")
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * per_ms)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / per_ms)
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / per_ms))
+return wait
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket: up to `capacity` requests at once, refilled at `rate` per second."""
+    capacity: int
+    rate: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse "<count>/<second|minute|hour|day>", e.g. "5/minute"."""
+        count, period = value.split("/")
+        return cls(capacity=int(count), rate=int(count) / _PERIODS[period.strip()])
+
+
+class RateLimiter(ABC):
+    """Token buckets keyed by e.g. route + client."""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        """Take a token from `key`'s bucket; return 0 if allowed, else seconds to wait."""
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Buckets for a single process; idle buckets are evicted once full again."""
+
+    def __init__(self, maxsize: int = 100000):
+        self._buckets: TTLCache[str, tuple[float, float]] = TTLCache(maxsize=maxsize, ttl=0)
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (limit.capacity, now)
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        self._buckets.set(key, (tokens, now), ttl=limit.capacity / limit.rate)
+        return wait
+
+
+class RedisRateLimiter(RateLimiter):
+    """Buckets shared by all workers, updated atomically by a Lua script."""
+
+    def __init__(self, redis: Redis):
+        self._take = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def hit(self, key: str, limit: RateLimit) -> float:
+        wait_ms = await self._take(
+            keys=[f"ratelimit:{key}"],
+            args=[limit.capacity, limit.rate / 1000],
+        )
+        return wait_ms / 1000
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Redis-backed limiter when Redis is enabled, in-process otherwise."""
+    redis = get_redis()
+    if redis is not None:
+        return RedisRateLimiter(redis)
+    return InMemoryRateLimiter()
+
+
+rate_limiter = create_rate_limiter()
+
+
+async def check_rate_limit(name: str, key: str, limit: RateLimit) -> float:
+    """
+    Count a request against `name`'s limit for `key`; seconds to wait if over.
+
+    Decisions are exported as ratelimit.<name>.allowed/rejected. If the
+    limiter itself fails the request is allowed.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    try:
+        wait = await rate_limiter.hit(f"{name}:{key}", limit)
+    except Exception:
+        metrics.incr("ratelimit.errors")
+        logger.exception("Rate limiter failed; allowing request")
+        return 0.0
+    metrics.incr(f"ratelimit.{name}.{'rejected' if wait else 'allowed'}")
+    return wait
+
+
+def _retry_after_headers(wait: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+async def enforce_rate_limit(name: str, key: str, limit: RateLimit) -> None:
+    """check_rate_limit() for use inside a handler: raises 429 when over."""
+    wait = await check_rate_limit(name, key, limit)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers=_retry_after_headers(wait),
+        )
+
+
+def client_ip(scope: Scope) -> str | None:
+    """Client address (run uvicorn with --proxy-headers behind a proxy)."""
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Limit `method path` per key; `key` returns None to skip the request."""
+    name: str
+    method: str
+    path: str
+    limit: RateLimit
+    key: Callable[[Scope], str | None] = client_ip
+
+
+class RateLimitMiddleware:
+    """
+    Applies rate limit rules before requests reach the app.
+
+    Rejected requests get 429 with Retry-After. Limits that depend on the
+    request body (e.g. per phone) are enforced in the handler instead.
+    """
+
+    def __init__(self, app: ASGIApp, rules: list[RateLimitRule]):
+        self.app = app
+        self._rules = {(rule.method, rule.path): rule for rule in rules}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            rule = self._rules.get((scope["method"], scope["path"]))
+            key = rule.key(scope) if rule else None
+            if key is not None:
+                wait = await check_rate_limit(rule.name, key, rule.limit)
+                if wait:
+                    response = JSONResponse(
+                        {"detail": "Too many requests"},
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers=_retry_after_headers(wait),
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
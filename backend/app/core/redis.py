@@ -0,0 +1,27 @@
+from redis.asyncio import Redis
+from app.core.config import settings
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis | None:
+    """
+    Shared Redis client, or None when Redis is disabled.
+
+    Stores that can live in Redis fall back to an in-process
+    implementation when this returns None (tests, single-worker runs).
+    """
+    global _redis
+    if not settings.REDIS_ENABLED:
+        return None
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    """Close the shared client's connection pool."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
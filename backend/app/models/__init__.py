@@ -1,6 +1,8 @@
 from app.models.user import User
 from app.models.profile import Profile
 from app.models.conversation import Conversation
+from app.models.message import Message
 from app.models.goal import Goal
+from app.models.llm_usage import LLMUsage
 
-__all__ = ["User", "Profile", "Conversation", "Goal"]
+__all__ = ["User", "Profile", "Conversation", "Message", "Goal", "LLMUsage"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Text, ForeignKey, JSON
+from sqlalchemy import Text, ForeignKey, JSON, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
 from app.models.base import TimestampMixin
@@ -10,14 +10,25 @@ class Conversation(Base, TimestampMixin):
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
 
-    # Messages as JSON array
-    messages: Mapped[list] = mapped_column(JSON, default=list)
+    # Legacy JSON message array, superseded by the messages table.
+    # Kept readable until every row has been backfilled (see migration 002).
+    legacy_messages: Mapped[list] = mapped_column("messages", JSON, default=list)
+
+    # Number of rows in the messages table; the next message gets seq + 1
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+
+    # Bumped by every change to the message list; writers update only the
+    # version they read (optimistic concurrency)
+    version: Mapped[int] = mapped_column(Integer, default=1)
 
     # AI-generated summary for long-term memory
     summary: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # Last message seq folded into summary
+    summarized_seq: Mapped[int] = mapped_column(Integer, default=0)
+
     # Extracted insights
-    extracted_insights: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    extracted_insights: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)
 
     # Relationship
     user: Mapped["User"] = relationship(back_populates="conversations")
@@ -0,0 +1,38 @@
+from datetime import date
+from sqlalchemy import String, ForeignKey, Date, Integer, BigInteger, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+from app.models.base import TimestampMixin
+
+
+class LLMUsage(Base, TimestampMixin):
+    """Daily LLM usage per user, model, purpose and prompt variant."""
+
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "day", "model", "purpose", "prompt_variant",
+            name="uq_llm_usage_rollup",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    day: Mapped[date] = mapped_column(Date, index=True)
+
+    model: Mapped[str] = mapped_column(String(50))
+    # What the call was for: chat, summary
+    purpose: Mapped[str] = mapped_column(String(20))
+    # Prompt variant (profile stage) for chat calls, empty otherwise
+    prompt_variant: Mapped[str] = mapped_column(String(20), default="")
+
+    calls: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    cached_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    # Estimated cost in millionths of a CNY
+    cost_micro_cny: Mapped[int] = mapped_column(BigInteger, default=0)
+    # Sums, divide by calls (streaming calls only for TTFT) for averages
+    latency_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    ttft_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    streamed_calls: Mapped[int] = mapped_column(Integer, default=0)
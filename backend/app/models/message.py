@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import String, Text, ForeignKey, DateTime, Integer, UniqueConstraint, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+
+class Message(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "seq", name="uq_messages_conversation_seq"),
+        # Keyset pagination of history by message id
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # No ORM relationship on purpose: history is always read in bounded
+    # slices, never by loading the whole collection.
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey("conversations.id", ondelete="CASCADE")
+    )
+
+    # Position within the conversation, starting at 1
+    seq: Mapped[int] = mapped_column(Integer)
+
+    # Role: user, assistant
+    role: Mapped[str] = mapped_column(String(20))
+    content: Mapped[str] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
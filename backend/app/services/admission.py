@@ -0,0 +1,89 @@
+import asyncio
+from collections import deque
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class AdmissionController:
+    """
+    Caps concurrent chat generations in this worker.
+
+    Requests beyond `limit` wait in per-user queues that are served
+    round-robin, so a user with many queued requests cannot starve the
+    others. A request that is not admitted within `max_wait` seconds is
+    rejected; the caller should answer 503 with Retry-After.
+    """
+
+    def __init__(self, limit: int, max_wait: float):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters: dict[int, deque[asyncio.Future]] = {}
+        self._order: deque[int] = deque()  # users with waiters, next to serve first
+
+    async def acquire(self, user_id: int) -> bool:
+        """Wait for a generation slot; False if none freed up within max_wait."""
+        if self._active < self.limit and not self._order:
+            self._active += 1
+            metrics.incr("admission.admitted")
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        if user_id not in self._waiters:
+            self._waiters[user_id] = deque()
+            self._order.append(user_id)
+        self._waiters[user_id].append(waiter)
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the wait ended: pass the slot on
+                self.release()
+            else:
+                self._discard(user_id, waiter)
+            if isinstance(e, TimeoutError):
+                metrics.incr("admission.rejected")
+                return False
+            raise
+        metrics.incr("admission.admitted")
+        metrics.incr("admission.queued")
+        return True
+
+    def release(self) -> None:
+        """Free a slot, handing it to the next waiting user if any."""
+        while self._order:
+            user_id = self._order.popleft()
+            queue = self._waiters[user_id]
+            waiter = queue.popleft()
+            if queue:
+                self._order.append(user_id)
+            else:
+                del self._waiters[user_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _discard(self, user_id: int, waiter: asyncio.Future) -> None:
+        queue = self._waiters.get(user_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._waiters[user_id]
+            self._order.remove(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "limit": self.limit,
+            "waiting": sum(len(queue) for queue in self._waiters.values()),
+        }
+
+
+admission = AdmissionController(
+    limit=settings.CHAT_MAX_CONCURRENT_GENERATIONS,
+    max_wait=settings.CHAT_ADMISSION_MAX_WAIT_SECONDS,
+)
+metrics.register_collector("admission", admission.stats)
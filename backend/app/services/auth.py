@@ -1,8 +1,12 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.models.user import User
 from app.models.profile import Profile
@@ -18,29 +22,111 @@ def create_access_token(user_id: int) -> str:
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
 
-def verify_token(token: str) -> int | None:
+def decode_token(token: str) -> dict | None:
+    """Verified claims of a token, or None if it is invalid or expired."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-        return user_id
+        int(payload.get("sub"))
+        return payload
     except:
         return None
 
 
-async def get_or_create_user(db: AsyncSession, phone: str) -> User:
-    """Get existing user or create new one with profile."""
-    result = await db.execute(select(User).where(User.phone == phone))
-    user = result.scalar_one_or_none()
+def verify_token(token: str) -> int | None:
+    payload = decode_token(token)
+    return int(payload["sub"]) if payload else None
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, as needed by request handlers."""
+    id: int
+    phone: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, phone=user.phone, is_active=user.is_active)
+
+
+class PrincipalCache:
+    """
+    Verified token -> Principal, so authenticated requests skip the users lookup.
+
+    Entries live at most `ttl` seconds and never past the token's expiry.
+    The cache is per process: invalidate_user() clears this worker, other
+    workers pick up a deactivation within `ttl`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache[str, Principal] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, token: str) -> Principal | None:
+        return self._cache.get(token)
+
+    def set(self, token: str, principal: Principal, expires_at: float) -> None:
+        """Cache a principal for a token that expires at unix time `expires_at`."""
+        ttl = min(self._cache.ttl, expires_at - time.time())
+        if ttl > 0:
+            self._cache.set(token, principal, ttl=ttl)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Forget every cached token of a user."""
+        for token, principal in self._cache.items():
+            if principal.id == user_id:
+                self._cache.pop(token)
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+async def get_or_create_user(db: AsyncSession, phone: str) -> int:
+    """
+    Get existing user or create new one with profile; returns the user id.
+
+    User and profile are created in one INSERT ... ON CONFLICT statement,
+    so concurrent first logins for the same phone all get the same user.
+    """
+    new_user = (
+        pg_insert(User)
+        .values(phone=phone, is_active=True)
+        .on_conflict_do_nothing(index_elements=[User.phone])
+        .returning(User.id)
+        .cte("new_user")
+    )
+    new_profile = (
+        pg_insert(Profile)
+        # Column defaults are not applied to INSERT ... SELECT in a CTE
+        .from_select(
+            [Profile.user_id, Profile.current_stage],
+            select(new_user.c.id, literal("new_user")),
+        )
+        .returning(Profile.user_id)
+        .cte("new_profile")
+    )
+    result = await db.execute(
+        select(new_user.c.id)
+        .add_cte(new_profile)
+        .union_all(select(User.id).where(User.phone == phone))
+        .limit(1)
+    )
+    user_id = result.scalar_one_or_none()
+    await db.commit()
+
+    if user_id is None:
+        # Lost a race with a first login that committed after this
+        # statement's snapshot was taken; the user is visible now
+        result = await db.execute(select(User.id).where(User.phone == phone))
+        user_id = result.scalar_one()
 
-    if not user:
-        user = User(phone=phone)
-        db.add(user)
-        await db.flush()
+    return user_id
 
-        # Create empty profile
-        profile = Profile(user_id=user.id)
-        db.add(profile)
-        await db.commit()
-        await db.refresh(user)
 
-    return user
+async def deactivate_user(db: AsyncSession, user_id: int) -> None:
+    """Deactivate a user; their tokens stop working immediately on this worker."""
+    await db.execute(update(User).where(User.id == user_id).values(is_active=False))
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
@@ -1,7 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, update
 from app.models.conversation import Conversation
+from app.models.message import Message
 from app.models.profile import Profile
+from app.models.user import User
+from app.core.metrics import metrics
+
+APPEND_MAX_ATTEMPTS = 3
 
 
 async def get_or_create_conversation(db: AsyncSession, user_id: int) -> Conversation:
@@ -16,7 +21,7 @@ async def get_or_create_conversation(db: AsyncSession, user_id: int) -> Conversa
     conversation = result.scalar_one_or_none()
 
     if not conversation:
-        conversation = Conversation(user_id=user_id, messages=[])
+        conversation = Conversation(user_id=user_id, message_count=0, summarized_seq=0, version=1)
         db.add(conversation)
         await db.commit()
         await db.refresh(conversation)
@@ -24,26 +29,190 @@ async def get_or_create_conversation(db: AsyncSession, user_id: int) -> Conversa
     return conversation
 
 
-async def add_message(
+async def load_chat_context(
+    db: AsyncSession,
+    user_id: int
+) -> tuple[Conversation, dict]:
+    """
+    Load the latest conversation and the profile in one round trip.
+
+    A conversation is created only if the user has none yet.
+
+    Returns:
+        Tuple of (conversation, profile dict)
+    """
+    result = await db.execute(
+        select(Conversation, Profile)
+        .select_from(User)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .outerjoin(Conversation, Conversation.user_id == User.id)
+        .where(User.id == user_id)
+        .order_by(Conversation.created_at.desc())
+        .limit(1)
+    )
+    row = result.first()
+    conversation, profile = row if row else (None, None)
+
+    if not conversation:
+        conversation = await get_or_create_conversation(db, user_id)
+
+    return conversation, profile_to_dict(profile)
+
+
+class ConversationConflict(Exception):
+    """The conversation kept changing underneath an append."""
+
+
+async def append_message(
     db: AsyncSession,
-    conversation: Conversation,
+    conversation_id: int,
+    seq: int,
+    version: int,
     role: str,
     content: str
-) -> None:
-    """Add a message to conversation."""
-    messages = conversation.messages.copy() if conversation.messages else []
-    messages.append({"role": role, "content": content})
-    conversation.messages = messages
-    await db.commit()
+) -> tuple[int, int]:
+    """
+    Append a message, expecting the conversation to still be at `version`.
+
+    The conversation row is advanced only if its version is unchanged
+    (optimistic concurrency). If another writer got there first the
+    conflict is counted and the message goes to the current end instead,
+    up to APPEND_MAX_ATTEMPTS times.
+
+    Returns:
+        Tuple of (seq the message was stored at, new conversation version)
+    """
+    for _ in range(APPEND_MAX_ATTEMPTS):
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id, Conversation.version == version)
+            .values(message_count=seq, version=version + 1)
+        )
+        if result.rowcount == 1:
+            db.add(Message(
+                conversation_id=conversation_id,
+                seq=seq,
+                role=role,
+                content=content,
+            ))
+            await db.commit()
+            return seq, version + 1
+
+        await db.rollback()
+        metrics.incr("chat.conversation_conflicts")
+        current = await db.execute(
+            select(Conversation.message_count, Conversation.version)
+            .where(Conversation.id == conversation_id)
+        )
+        message_count, version = current.one()
+        seq = message_count + 1
+
+    raise ConversationConflict(f"Conversation {conversation_id} changed {APPEND_MAX_ATTEMPTS} times")
+
+
+async def get_messages(
+    db: AsyncSession,
+    conversation_id: int,
+    limit: int | None = None,
+    after_seq: int = 0
+) -> list[dict]:
+    """
+    Get conversation messages in chronological order.
 
+    Args:
+        conversation_id: Conversation to read
+        limit: Only return the most recent `limit` messages
+        after_seq: Only return messages after this seq (e.g. the summarized part)
 
-async def get_user_profile(db: AsyncSession, user_id: int) -> dict:
-    """Get user profile as dict."""
+    Returns:
+        List of {"id", "role", "content", "created_at"} dicts
+    """
+    query = (
+        select(Message)
+        .where(Message.conversation_id == conversation_id, Message.seq > after_seq)
+        .order_by(Message.seq.desc())
+    )
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    rows = list(result.scalars().all())
+    rows.reverse()
+
+    return [message_to_dict(m) for m in rows]
+
+
+async def get_message_range(
+    db: AsyncSession,
+    conversation_id: int,
+    after_seq: int,
+    through_seq: int,
+    limit: int
+) -> list[dict]:
+    """Get up to `limit` messages with after_seq < seq <= through_seq, oldest first."""
     result = await db.execute(
-        select(Profile).where(Profile.user_id == user_id)
+        select(Message)
+        .where(
+            Message.conversation_id == conversation_id,
+            Message.seq > after_seq,
+            Message.seq <= through_seq,
+        )
+        .order_by(Message.seq.asc())
+        .limit(limit)
     )
-    profile = result.scalar_one_or_none()
+    return [message_to_dict(m) for m in result.scalars().all()]
+
+
+async def get_messages_page(
+    db: AsyncSession,
+    conversation_id: int,
+    limit: int,
+    before_id: int | None = None,
+    after_id: int | None = None
+) -> tuple[list[dict], bool]:
+    """
+    Get one page of messages using keyset pagination on message id.
+
+    Without a cursor the most recent page is returned. With `before_id`
+    the page ends just before that message (scrolling back); with
+    `after_id` it starts just after it (catching up since last seen).
 
+    Returns:
+        Tuple of (messages in chronological order, has_more)
+    """
+    query = select(Message).where(Message.conversation_id == conversation_id)
+
+    if after_id is not None:
+        query = query.where(Message.id > after_id).order_by(Message.id.asc())
+    else:
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        query = query.order_by(Message.id.desc())
+
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if after_id is None:
+        rows.reverse()
+
+    return [message_to_dict(m) for m in rows], has_more
+
+
+def message_to_dict(message: Message) -> dict:
+    """Serialize a message row for the API and the agent."""
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": message.content,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+    }
+
+
+def profile_to_dict(profile: Profile | None) -> dict:
+    """Profile fields used to build the agent's user context."""
     if not profile:
         return {}
 
@@ -83,7 +252,16 @@ async def clear_user_conversations(db: AsyncSession, user_id: int) -> None:
     )
     conversations = result.scalars().all()
 
+    await db.execute(
+        delete(Message).where(
+            Message.conversation_id.in_([conv.id for conv in conversations])
+        )
+    )
     for conv in conversations:
-        conv.messages = []
+        conv.legacy_messages = []
+        conv.message_count = 0
+        conv.version += 1
+        conv.summarized_seq = 0
+        conv.summary = None
 
     await db.commit()
@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from redis.asyncio import Redis
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# Delete the key only if it is still bound to the caller's value
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotencyStore(ABC):
+    """
+    Maps client idempotency keys to the result they first produced.
+
+    claim() is atomic: of several concurrent requests with the same key,
+    exactly one gets None back and goes on to do the work; the others get
+    that request's value.
+    """
+
+    @abstractmethod
+    async def claim(self, key: str, value: str) -> str | None:
+        """Bind `key` to `value`; return the existing value if already bound."""
+
+    @abstractmethod
+    async def release(self, key: str, value: str) -> None:
+        """Unbind `key` if still bound to `value`, so a retry starts afresh."""
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Idempotency keys for a single process."""
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self._keys: TTLCache[str, str] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def claim(self, key: str, value: str) -> str | None:
+        existing = self._keys.get(key)
+        if existing is not None:
+            return existing
+        self._keys.set(key, value)
+        return None
+
+    async def release(self, key: str, value: str) -> None:
+        if self._keys.get(key) == value:
+            self._keys.pop(key)
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Idempotency keys shared by all workers (SET NX with expiry)."""
+
+    def __init__(self, redis: Redis, ttl: int):
+        self._redis = redis
+        self._ttl = ttl
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    async def claim(self, key: str, value: str) -> str | None:
+        redis_key = f"idempotency:{key}"
+        if await self._redis.set(redis_key, value, nx=True, ex=self._ttl):
+            return None
+        existing = await self._redis.get(redis_key)
+        # Expired between SET and GET: the key is free again
+        return existing if existing is not None else await self.claim(key, value)
+
+    async def release(self, key: str, value: str) -> None:
+        await self._release(keys=[f"idempotency:{key}"], args=[value])
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """
+    Redis-backed store when Redis is enabled, in-process otherwise.
+
+    Keys live as long as a stream buffer entry: a key must not outlive the
+    stream it points to, or a retry could find neither a reply to replay
+    nor permission to generate one.
+    """
+    redis = get_redis()
+    if redis is not None:
+        return RedisIdempotencyStore(redis, ttl=settings.STREAM_BUFFER_TTL_SECONDS)
+    return InMemoryIdempotencyStore(ttl=settings.STREAM_BUFFER_TTL_SECONDS)
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.metrics import metrics
+from app.models.llm_usage import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+# (user_id, day, model, purpose, prompt_variant)
+UsageKey = tuple[int, date, str, str, str]
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost_micro_cny: int = 0
+    latency_ms: int = 0
+    ttft_ms: int = 0
+    streamed_calls: int = 0
+
+    def add(self, other: "UsageTotals") -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def _clip(column: str, value: str) -> str:
+    """`value` cut to the length of an llm_usage column; a longer one would fail every flush."""
+    return value[:LLMUsage.__table__.c[column].type.length]
+
+
+def usage_day() -> date:
+    """Today in USAGE_DAY_TIMEZONE; daily rollups and quotas use this day."""
+    return datetime.now(ZoneInfo(settings.USAGE_DAY_TIMEZONE)).date()
+
+
+class UsageMeter:
+    """
+    Per-user LLM usage, aggregated in memory and flushed in batches.
+
+    Calls are summed per (user, day, model, purpose, prompt variant) and
+    upserted into llm_usage every `flush_interval` seconds, or sooner once
+    `flush_max_keys` rollups are pending. A flush that fails keeps its
+    totals for the next one, except rollups the database rejects for good
+    (e.g. the user was deleted), which are logged and dropped.
+    """
+
+    def __init__(self, flush_interval: float, flush_max_keys: int):
+        self._flush_interval = flush_interval
+        self._flush_max_keys = flush_max_keys
+        self._pending: dict[UsageKey, UsageTotals] = {}
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def record(
+        self,
+        user_id: int,
+        model: str,
+        purpose: str,
+        usage: dict | None,
+        cost: float,
+        latency: float,
+        first_token_latency: float | None = None,
+        prompt_variant: str = ""
+    ) -> None:
+        """Add one model call to the pending rollups."""
+        key = (
+            user_id,
+            usage_day(),
+            _clip("model", model),
+            _clip("purpose", purpose),
+            _clip("prompt_variant", prompt_variant or ""),
+        )
+        totals = self._pending.setdefault(key, UsageTotals())
+        totals.add(UsageTotals(
+            calls=1,
+            prompt_tokens=usage["prompt_tokens"] if usage else 0,
+            completion_tokens=usage["completion_tokens"] if usage else 0,
+            cached_tokens=usage["cached_tokens"] if usage else 0,
+            cost_micro_cny=round(cost * 1_000_000),
+            latency_ms=round(latency * 1000),
+            ttft_ms=round(first_token_latency * 1000) if first_token_latency is not None else 0,
+            streamed_calls=1 if first_token_latency is not None else 0,
+        ))
+        if len(self._pending) >= self._flush_max_keys:
+            self._flush_now.set()
+
+    def pending_tokens(self, user_id: int, day: date) -> int:
+        """Tokens recorded for a user on `day` and not flushed yet."""
+        return sum(
+            totals.tokens for key, totals in self._pending.items()
+            if key[0] == user_id and key[1] == day
+        )
+
+    async def flush(self) -> None:
+        """Upsert pending rollups, adding to any existing rows."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        remaining = dict(batch)
+        dropped = 0
+        try:
+            try:
+                await self._write(batch)
+                remaining.clear()
+            except IntegrityError:
+                # One bad row fails the whole statement and would fail every
+                # retry: write rows one at a time and drop the rejected ones
+                for key, totals in batch.items():
+                    try:
+                        await self._write({key: totals})
+                    except IntegrityError as e:
+                        logger.warning("Dropping usage rollup %s (%s tokens): %s", key, totals.tokens, e.orig)
+                        dropped += 1
+                    del remaining[key]
+        except Exception:
+            # Put the rest back so the next flush retries it
+            for key, totals in remaining.items():
+                self._pending.setdefault(key, UsageTotals()).add(totals)
+            metrics.incr("usage.flush_failed")
+            raise
+        finally:
+            if dropped:
+                metrics.incr("usage.rows_dropped", dropped)
+        metrics.incr("usage.rows_flushed", len(batch) - dropped)
+
+    async def _write(self, batch: dict[UsageKey, UsageTotals]) -> None:
+        rows = [
+            {
+                "user_id": user_id,
+                "day": day,
+                "model": model,
+                "purpose": purpose,
+                "prompt_variant": variant,
+                **vars(totals),
+            }
+            for (user_id, day, model, purpose, variant), totals in batch.items()
+        ]
+        counters = [field.name for field in fields(UsageTotals)]
+        statement = pg_insert(LLMUsage).values(rows)
+        statement = statement.on_conflict_do_update(
+            constraint="uq_llm_usage_rollup",
+            set_={
+                **{name: getattr(LLMUsage, name) + getattr(statement.excluded, name) for name in counters},
+                "updated_at": func.now(),
+            },
+        )
+        async with async_session() as db:
+            await db.execute(statement)
+            await db.commit()
+
+    async def start(self) -> None:
+        """Start the periodic flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and flush what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final usage flush failed")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Usage flush failed")
+
+    def stats(self) -> dict:
+        return {"pending_rollups": len(self._pending)}
+
+
+usage_meter = UsageMeter(
+    flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    flush_max_keys=settings.USAGE_FLUSH_MAX_KEYS,
+)
+metrics.register_collector("usage", usage_meter.stats)
+
+
+async def tokens_used_today(db: AsyncSession, user_id: int) -> int:
+    """Tokens a user has used today: flushed rollups plus this worker's pending ones."""
+    day = usage_day()
+    result = await db.execute(
+        select(func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0))
+        .where(LLMUsage.user_id == user_id, LLMUsage.day == day)
+    )
+    return int(result.scalar_one()) + usage_meter.pending_tokens(user_id, day)
+
+
+async def within_daily_quota(db: AsyncSession, user_id: int) -> bool:
+    """Whether the user may start another generation today (always, without a quota)."""
+    if not settings.USAGE_DAILY_TOKEN_QUOTA:
+        return True
+    return await tokens_used_today(db, user_id) < settings.USAGE_DAILY_TOKEN_QUOTA
+
+
+def _rollup_columns():
+    return (
+        func.sum(LLMUsage.calls).label("calls"),
+        func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+        func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+        func.sum(LLMUsage.cached_tokens).label("cached_tokens"),
+        func.sum(LLMUsage.cost_micro_cny).label("cost_micro_cny"),
+        func.sum(LLMUsage.latency_ms).label("latency_ms"),
+        func.sum(LLMUsage.ttft_ms).label("ttft_ms"),
+        func.sum(LLMUsage.streamed_calls).label("streamed_calls"),
+    )
+
+
+def _rollup_to_dict(row) -> dict:
+    """Serialize summed usage columns, with averages and cost in CNY."""
+    return {
+        "calls": row.calls,
+        "prompt_tokens": row.prompt_tokens,
+        "completion_tokens": row.completion_tokens,
+        "cached_tokens": row.cached_tokens,
+        "cost_cny": row.cost_micro_cny / 1_000_000,
+        "avg_latency_ms": row.latency_ms / row.calls if row.calls else 0.0,
+        "avg_ttft_ms": row.ttft_ms / row.streamed_calls if row.streamed_calls else None,
+    }
+
+
+async def get_daily_usage(db: AsyncSession, day: date, limit: int) -> list[dict]:
+    """Per-user totals for a day, most expensive users first."""
+    cost = func.sum(LLMUsage.cost_micro_cny)
+    result = await db.execute(
+        select(LLMUsage.user_id, *_rollup_columns())
+        .where(LLMUsage.day == day)
+        .group_by(LLMUsage.user_id)
+        .order_by(cost.desc())
+        .limit(limit)
+    )
+    return [{"user_id": row.user_id, **_rollup_to_dict(row)} for row in result]
+
+
+async def get_user_usage(db: AsyncSession, user_id: int, since: date) -> list[dict]:
+    """A user's daily rollups since `since`, by model, purpose and prompt variant."""
+    result = await db.execute(
+        select(
+            LLMUsage.day,
+            LLMUsage.model,
+            LLMUsage.purpose,
+            LLMUsage.prompt_variant,
+            *_rollup_columns(),
+        )
+        .where(LLMUsage.user_id == user_id, LLMUsage.day >= since)
+        .group_by(LLMUsage.day, LLMUsage.model, LLMUsage.purpose, LLMUsage.prompt_variant)
+        .order_by(LLMUsage.day.desc(), LLMUsage.model)
+    )
+    return [
+        {
+            "day": row.day.isoformat(),
+            "model": row.model,
+            "purpose": row.purpose,
+            "prompt_variant": row.prompt_variant,
+            **_rollup_to_dict(row),
+        }
+        for row in result
+    ]
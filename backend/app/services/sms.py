@@ -1,5 +1,12 @@
+import asyncio
+import logging
 import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 
 class SMSService:
@@ -7,15 +14,168 @@ class SMSService:
         """Generate a random numeric verification code."""
         return "".join(random.choices("0123456789", k=length))
 
-    async def send_code(self, phone: str, code: str) -> bool:
-        """
-        Send verification code via SMS.
-        In production, integrate with Aliyun SMS or other provider.
-        For MVP, just log and return True.
-        """
-        if settings.DEBUG:
-            print(f"[DEBUG SMS] Sending code {code} to {phone}")
-            return True
-
-        # TODO: Integrate real SMS provider
+
+@dataclass
+class SMSMessage:
+    phone: str
+    code: str
+    attempts: int = 0
+
+
+class SMSProvider(ABC):
+    """
+    Sends verification codes through an SMS gateway.
+
+    `max_batch_size` is how many messages one send_batch() call may carry
+    (1 for providers without a batch API). A failed call raises and the
+    whole batch is retried.
+    """
+
+    max_batch_size: int = 1
+
+    @abstractmethod
+    async def send_batch(self, messages: list[SMSMessage]) -> None:
+        ...
+
+
+class LogSMSProvider(SMSProvider):
+    """Logs codes instead of sending them; only in DEBUG, so codes never reach production logs."""
+
+    max_batch_size = 100
+
+    async def send_batch(self, messages: list[SMSMessage]) -> None:
+        if not settings.DEBUG:
+            return
+        for message in messages:
+            logger.info("SMS code %s to %s", message.code, message.phone)
+
+
+class FakeSMSProvider(SMSProvider):
+    """In-memory provider for tests and load runs, with optional latency and failures."""
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, max_batch_size: int = 100):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_batch_size = max_batch_size
+        self.sent: list[SMSMessage] = []
+        self.calls = 0
+
+    async def send_batch(self, messages: list[SMSMessage]) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("fake SMS provider failure")
+        self.sent.extend(messages)
+
+
+class SMSDispatcher:
+    """
+    Background SMS sending with a bounded queue and a worker pool.
+
+    Each worker takes whatever is queued, up to the provider's batch size,
+    and sends it in one call. Failed batches are retried with exponential
+    backoff up to `max_retries` times, then dropped and counted.
+    """
+
+    def __init__(
+        self,
+        provider: SMSProvider,
+        workers: int,
+        queue_size: int,
+        max_retries: int,
+        retry_backoff: float
+    ):
+        self.provider = provider
+        self._workers = workers
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._queue: asyncio.Queue[SMSMessage] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+
+    def enqueue(self, phone: str, code: str) -> bool:
+        """Queue a code for sending; returns False if the queue is full."""
+        try:
+            self._queue.put_nowait(SMSMessage(phone=phone, code=code))
+        except asyncio.QueueFull:
+            metrics.incr("sms.dropped")
+            return False
         return True
+
+    async def start(self) -> None:
+        """Start worker tasks."""
+        if self._tasks:
+            return
+        for _ in range(self._workers):
+            self._tasks.append(asyncio.create_task(self._run_worker()))
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Give queued messages up to `drain_timeout` seconds, then cancel workers."""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping with %s SMS unsent", self._queue.qsize())
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_worker(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.provider.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self.provider.send_batch(batch)
+                metrics.incr("sms.sent", len(batch))
+            except Exception:
+                logger.exception("Sending %s SMS failed", len(batch))
+                for message in batch:
+                    self._retry(message)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _retry(self, message: SMSMessage) -> None:
+        message.attempts += 1
+        if message.attempts > self._max_retries:
+            metrics.incr("sms.failed")
+            return
+        metrics.incr("sms.retried")
+        task = asyncio.create_task(self._requeue_later(message))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue_later(self, message: SMSMessage) -> None:
+        await asyncio.sleep(self._retry_backoff * 2 ** (message.attempts - 1))
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            metrics.incr("sms.dropped")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "retrying": len(self._retries),
+            "workers": self._workers,
+        }
+
+
+def create_sms_provider() -> SMSProvider:
+    """Provider selected by SMS_PROVIDER."""
+    if settings.SMS_PROVIDER == "fake":
+        return FakeSMSProvider()
+    return LogSMSProvider()
+
+
+sms_dispatcher = SMSDispatcher(
+    create_sms_provider(),
+    workers=settings.SMS_WORKERS,
+    queue_size=settings.SMS_QUEUE_SIZE,
+    max_retries=settings.SMS_MAX_RETRIES,
+    retry_backoff=settings.SMS_RETRY_BACKOFF_SECONDS,
+)
+metrics.register_collector("sms", sms_dispatcher.stats)
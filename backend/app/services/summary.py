@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from sqlalchemy import select, update
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.metrics import metrics
+from app.models.conversation import Conversation
+from app.services.conversation import get_message_range
+from app.ai.agent import summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+# Insights kept on a conversation, most recent last
+MAX_CONVERSATION_INSIGHTS = 20
+
+
+def _fold_boundary(conversation: Conversation) -> int:
+    """Last seq that is outside the verbatim context window."""
+    return conversation.message_count - settings.CONTEXT_KEEP_TURNS * 2
+
+
+async def fold_conversation_summary(conversation_id: int) -> bool:
+    """
+    Fold messages that fell out of the context window into the summary.
+
+    Only messages older than the last CONTEXT_KEEP_TURNS turns and newer
+    than `summarized_seq` are read, and they are summarized on top of the
+    existing summary, at most SUMMARY_FOLD_MAX_MESSAGES per LLM call.
+    Insights found along the way are merged into `extracted_insights`.
+
+    No session is held during the LLM call: each batch is read, then
+    summarized, then written back only if `summarized_seq` is unchanged
+    and the folded messages still exist. Turns appended meanwhile keep the
+    fold. A cleared history or a concurrent fold discards it and stops;
+    the next enqueue or sweep picks the conversation up again.
+
+    Returns:
+        True if the summary was updated
+    """
+    updated = False
+    while True:
+        async with async_session() as db:
+            result = await db.execute(
+                select(Conversation).where(Conversation.id == conversation_id)
+            )
+            conversation = result.scalar_one_or_none()
+            if not conversation:
+                return updated
+
+            fold_through = _fold_boundary(conversation)
+            pending = fold_through - conversation.summarized_seq
+            if pending <= 0 or (not updated and pending < settings.SUMMARY_FOLD_MIN_MESSAGES):
+                return updated
+
+            messages = await get_message_range(
+                db,
+                conversation.id,
+                after_seq=conversation.summarized_seq,
+                through_seq=fold_through,
+                limit=settings.SUMMARY_FOLD_MAX_MESSAGES,
+            )
+            if not messages:
+                return updated
+
+        summary, insights = await summarize_conversation(
+            conversation.summary, messages, user_id=conversation.user_id
+        )
+        values = {
+            "summary": summary,
+            "summarized_seq": conversation.summarized_seq + len(messages),
+        }
+        if insights:
+            existing = list(conversation.extracted_insights or [])
+            merged = list(dict.fromkeys(existing + insights))
+            values["extracted_insights"] = merged[-MAX_CONVERSATION_INSIGHTS:]
+
+        async with async_session() as db:
+            result = await db.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.summarized_seq == conversation.summarized_seq,
+                    Conversation.message_count >= fold_through,
+                )
+                .values(**values)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            metrics.incr("summarizer.conflicts")
+            return updated
+        updated = True
+
+
+class SummarizerWorker:
+    """
+    Background summarization with a job queue and bounded concurrency.
+
+    Conversations are enqueued after each reply and also found by a
+    periodic sweep, so jobs dropped while the queue was full (or lost on
+    restart) are picked up later. A conversation is queued at most once
+    at a time.
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, sweep_interval: float):
+        self._concurrency = concurrency
+        self._sweep_interval = sweep_interval
+        self._queue: asyncio.Queue[int] = asyncio.Queue(maxsize=queue_size)
+        self._queued: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    def enqueue(self, conversation_id: int) -> bool:
+        """Queue a conversation for folding; returns False if dropped."""
+        if conversation_id in self._queued:
+            return True
+        try:
+            self._queue.put_nowait(conversation_id)
+        except asyncio.QueueFull:
+            metrics.incr("summarizer.dropped")
+            return False
+        self._queued.add(conversation_id)
+        return True
+
+    async def start(self) -> None:
+        """Start worker tasks and the sweep loop."""
+        if self._tasks:
+            return
+        for _ in range(self._concurrency):
+            self._tasks.append(asyncio.create_task(self._run_worker()))
+        if self._sweep_interval > 0:
+            self._tasks.append(asyncio.create_task(self._run_sweeper()))
+
+    async def stop(self) -> None:
+        """Cancel workers; unfinished jobs are found again by the next sweep."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_worker(self) -> None:
+        while True:
+            conversation_id = await self._queue.get()
+            try:
+                if await fold_conversation_summary(conversation_id):
+                    metrics.incr("summarizer.folded")
+            except Exception:
+                metrics.incr("summarizer.failed")
+                logger.exception("Summarizing conversation %s failed", conversation_id)
+            finally:
+                self._queued.discard(conversation_id)
+                self._queue.task_done()
+
+    async def _run_sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            try:
+                for conversation_id in await self._find_backlog():
+                    self.enqueue(conversation_id)
+            except Exception:
+                logger.exception("Summarizer sweep failed")
+
+    async def _find_backlog(self) -> list[int]:
+        """Conversations whose un-summarized tail exceeds the fold threshold."""
+        free_slots = self._queue.maxsize - self._queue.qsize()
+        if free_slots <= 0:
+            return []
+        threshold = settings.CONTEXT_KEEP_TURNS * 2 + settings.SUMMARY_FOLD_MIN_MESSAGES
+        async with async_session() as db:
+            result = await db.execute(
+                select(Conversation.id)
+                .where(Conversation.message_count - Conversation.summarized_seq >= threshold)
+                .order_by(Conversation.updated_at.asc())
+                .limit(free_slots)
+            )
+            return list(result.scalars().all())
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": self._concurrency,
+            "running": bool(self._tasks),
+        }
+
+
+summarizer = SummarizerWorker(
+    concurrency=settings.SUMMARY_WORKERS,
+    queue_size=settings.SUMMARY_QUEUE_SIZE,
+    sweep_interval=settings.SUMMARY_SWEEP_INTERVAL_SECONDS,
+)
+metrics.register_collector("summarizer", summarizer.stats)
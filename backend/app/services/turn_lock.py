@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from redis.asyncio import Redis
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# Delete the lock only if this holder still owns it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class TurnLock(ABC):
+    """
+    One chat turn at a time per user.
+
+    A turn holds the lock from reading the history until its reply is
+    stored, so concurrent sends cannot build on the same history or race
+    each other's writes. acquire() waits at most `timeout` seconds.
+    """
+
+    @abstractmethod
+    async def acquire(self, user_id: int, timeout: float) -> str | None:
+        """Wait for the user's lock; return a token for release(), or None on timeout."""
+
+    @abstractmethod
+    async def release(self, user_id: int, token: str) -> None:
+        ...
+
+
+class InMemoryTurnLock(TurnLock):
+    """Per-user asyncio locks; waiters are served in arrival order."""
+
+    def __init__(self):
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._users: dict[int, int] = {}
+
+    async def acquire(self, user_id: int, timeout: float) -> str | None:
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        self._users[user_id] = self._users.get(user_id, 0) + 1
+        try:
+            async with asyncio.timeout(timeout):
+                await lock.acquire()
+        except TimeoutError:
+            self._forget(user_id)
+            return None
+        return "local"
+
+    async def release(self, user_id: int, token: str) -> None:
+        self._locks[user_id].release()
+        self._forget(user_id)
+
+    def _forget(self, user_id: int) -> None:
+        """Drop the user's lock once nobody holds or waits for it."""
+        self._users[user_id] -= 1
+        if not self._users[user_id]:
+            del self._users[user_id]
+            del self._locks[user_id]
+
+
+class RedisTurnLock(TurnLock):
+    """
+    Per-user lock shared by all workers (SET NX PX).
+
+    The lock expires after `ttl` seconds so a crashed worker cannot block
+    a user forever; waiters poll for it.
+    """
+
+    def __init__(self, redis: Redis, ttl: float, poll_interval: float = 0.05):
+        self._redis = redis
+        self._ttl_ms = int(ttl * 1000)
+        self._poll_interval = poll_interval
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    async def acquire(self, user_id: int, timeout: float) -> str | None:
+        token = uuid.uuid4().hex
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not await self._redis.set(f"chat:turn:{user_id}", token, nx=True, px=self._ttl_ms):
+            if asyncio.get_running_loop().time() >= deadline:
+                return None
+            await asyncio.sleep(self._poll_interval)
+        return token
+
+    async def release(self, user_id: int, token: str) -> None:
+        await self._release(keys=[f"chat:turn:{user_id}"], args=[token])
+
+
+def create_turn_lock() -> TurnLock:
+    """Redis-backed lock when Redis is enabled, in-process otherwise."""
+    redis = get_redis()
+    if redis is not None:
+        return RedisTurnLock(redis, ttl=settings.TURN_LOCK_TTL_SECONDS)
+    return InMemoryTurnLock()
+
+
+turn_locks = create_turn_lock()
@@ -0,0 +1,121 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from redis.asyncio import Redis
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# Consume the code if it matches. Otherwise count the failure (the
+# counter expires with the code) and delete both after ARGV[2] failures.
+_CHECK_SCRIPT = """
+local code = redis.call("get", KEYS[1])
+if not code then
+    return 0
+end
+if code == ARGV[1] then
+    redis.call("del", KEYS[1], KEYS[2])
+    return 1
+end
+local failures = redis.call("incr", KEYS[2])
+if failures == 1 then
+    redis.call("pexpire", KEYS[2], math.max(redis.call("pttl", KEYS[1]), 1))
+end
+if failures >= tonumber(ARGV[2]) then
+    redis.call("del", KEYS[1], KEYS[2])
+end
+return 0
+"""
+
+
+class CodeStore(ABC):
+    """
+    Pending SMS verification codes, one per phone.
+
+    Codes expire `ttl` seconds after they were sent; sending a new code
+    replaces the previous one. check() consumes a matching code, so each
+    code logs in at most once. After `max_attempts` wrong guesses the code
+    is invalidated, whichever IPs they came from.
+    """
+
+    @abstractmethod
+    async def put(self, phone: str, code: str) -> None:
+        ...
+
+    @abstractmethod
+    async def check(self, phone: str, code: str) -> bool:
+        """Whether `code` is the pending code for `phone`; consumes it if so."""
+
+
+@dataclass
+class _PendingCode:
+    code: str
+    failures: int = 0
+
+
+class InMemoryCodeStore(CodeStore):
+    """Codes for a single process (tests, one worker)."""
+
+    def __init__(self, ttl: float, max_attempts: int, maxsize: int = 100000):
+        self._codes: TTLCache[str, _PendingCode] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._max_attempts = max_attempts
+
+    async def put(self, phone: str, code: str) -> None:
+        self._codes.set(phone, _PendingCode(code))
+
+    async def check(self, phone: str, code: str) -> bool:
+        pending = self._codes.get(phone)
+        if pending is None:
+            return False
+        if pending.code == code:
+            self._codes.pop(phone)
+            return True
+        pending.failures += 1
+        if pending.failures >= self._max_attempts:
+            self._codes.pop(phone)
+        return False
+
+
+class RedisCodeStore(CodeStore):
+    """Codes and their failure counts shared by all workers, expired by Redis."""
+
+    def __init__(self, redis: Redis, ttl: int, max_attempts: int):
+        self._redis = redis
+        self._ttl = ttl
+        self._max_attempts = max_attempts
+        self._check = redis.register_script(_CHECK_SCRIPT)
+
+    @staticmethod
+    def _key(phone: str) -> str:
+        return f"auth:code:{phone}"
+
+    async def put(self, phone: str, code: str) -> None:
+        key = self._key(phone)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, code, ex=self._ttl)
+            pipe.delete(f"{key}:failures")
+            await pipe.execute()
+
+    async def check(self, phone: str, code: str) -> bool:
+        key = self._key(phone)
+        return bool(await self._check(
+            keys=[key, f"{key}:failures"],
+            args=[code, self._max_attempts],
+        ))
+
+
+def create_code_store() -> CodeStore:
+    """Redis-backed store when Redis is enabled, in-process otherwise."""
+    redis = get_redis()
+    if redis is not None:
+        return RedisCodeStore(
+            redis,
+            ttl=settings.VERIFICATION_CODE_TTL_SECONDS,
+            max_attempts=settings.VERIFICATION_MAX_ATTEMPTS,
+        )
+    return InMemoryCodeStore(
+        ttl=settings.VERIFICATION_CODE_TTL_SECONDS,
+        max_attempts=settings.VERIFICATION_MAX_ATTEMPTS,
+    )
+
+
+code_store = create_code_store()
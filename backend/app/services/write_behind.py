@@ -0,0 +1,54 @@
+import asyncio
+from typing import Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import async_session
+
+Write = Callable[[AsyncSession], Awaitable[None]]
+
+
+class WriteBehind:
+    """
+    Ordered database writes that run alongside the caller.
+
+    Each submitted write starts right away in its own session, after the
+    previous write has finished, so the caller (e.g. a streaming LLM
+    call) is not blocked on commits. flush() waits for everything
+    submitted so far and re-raises the first failure; writes queued
+    after a failed one are not applied.
+    """
+
+    def __init__(self):
+        self._pending: list[asyncio.Task] = []
+
+    def submit(self, write: Write) -> None:
+        """Schedule a write to run after all previously submitted ones."""
+        previous = self._pending[-1] if self._pending else None
+        self._pending.append(asyncio.create_task(self._run(previous, write)))
+
+    async def _run(self, previous: asyncio.Task | None, write: Write) -> None:
+        if previous is not None:
+            await previous  # re-raises its failure, so this write is skipped
+        async with async_session() as db:
+            await write(db)
+
+    async def flush(self) -> None:
+        """
+        Wait until every submitted write is committed.
+
+        Every task is awaited and its outcome retrieved, even behind a
+        failure; the first failure is then raised. Writes submitted after
+        flush() start a new chain.
+        """
+        tasks, self._pending = self._pending, []
+        if not tasks:
+            return
+        try:
+            await asyncio.wait(tasks)
+        except asyncio.CancelledError:
+            # The writes keep running; a later flush() still waits for them
+            self._pending = tasks + self._pending
+            raise
+        errors = [task.exception() for task in tasks]
+        first = next((error for error in errors if error is not None), None)
+        if first is not None:
+            raise first
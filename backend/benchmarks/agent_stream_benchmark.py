@@ -0,0 +1,114 @@
+"""
+Per-turn overhead of streaming through the compiled coaching graph.
+
+Streams the same reply from an in-process fake chat model (no network)
+that sends a chunk every --interval milliseconds (default 0: back to
+back, which isolates CPU cost from timer jitter), two ways: directly
+with model.astream() on the prompt messages, as the streaming path used
+to, and through chat_stream_with_agent(), which runs coaching_agent with
+stream_mode="custom". Reports median and p95 time to first chunk and
+to the end of the turn for both, and the median difference, i.e. what
+the graph adds to a turn.
+
+Usage (from backend/):
+    python -m benchmarks.agent_stream_benchmark
+    python -m benchmarks.agent_stream_benchmark --turns 500 --chunks 200 --interval 2
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import AIMessageChunk
+
+import app.ai.agent as agent
+
+HISTORY = [
+    {"role": "user", "content": "我最近总是拖延，不知道为什么"},
+    {"role": "assistant", "content": "能说说拖延的时候你通常在做什么吗？"},
+    {"role": "user", "content": "刷手机，然后又很自责"},
+]
+PROFILE = {"current_stage": "exploring"}
+
+
+class PacedModel:
+    """Fake chat model streaming `chunks` chunks, one every `interval` seconds."""
+
+    def __init__(self, chunks: int, interval: float):
+        self.chunks = chunks
+        self.interval = interval
+
+    async def astream(self, messages):
+        for _ in range(self.chunks):
+            await asyncio.sleep(self.interval)
+            yield AIMessageChunk(content="好")
+
+
+async def _direct_turn(model: PacedModel) -> float | None:
+    start = time.perf_counter()
+    messages = agent.build_prompt_messages(HISTORY, PROFILE)
+    first = None
+    async for _ in model.astream(messages):
+        first = first or time.perf_counter() - start
+    return first
+
+
+async def _graph_turn(model: PacedModel) -> float | None:
+    start = time.perf_counter()
+    first = None
+    async for _ in agent.chat_stream_with_agent(HISTORY, PROFILE, []):
+        first = first or time.perf_counter() - start
+    return first
+
+
+async def _latencies(turn, model: PacedModel, turns: int) -> tuple[list[float], list[float]]:
+    first_chunk, total = [], []
+    for _ in range(turns):
+        start = time.perf_counter()
+        first_chunk.append(await turn(model))
+        total.append(time.perf_counter() - start)
+    return sorted(first_chunk), sorted(total)
+
+
+def _p50_p95(latencies: list[float]) -> tuple[float, float]:
+    return (
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    )
+
+
+async def run(turns: int, chunks: int, interval: float) -> None:
+    model = PacedModel(chunks, interval)
+    agent.get_chat_model = lambda name, streaming=True, temperature=0.7: model
+
+    print(f"{'path':<10}{'first p50':>12}{'first p95':>12}{'total p50':>12}{'total p95':>12}")
+    medians = {}
+    for name, turn in (("direct", _direct_turn), ("graph", _graph_turn)):
+        await _latencies(turn, model, 10)  # warm up
+        first_chunk, total = await _latencies(turn, model, turns)
+        first_p50, first_p95 = _p50_p95(first_chunk)
+        total_p50, total_p95 = _p50_p95(total)
+        medians[name] = (first_p50, total_p50)
+        print(
+            f"{name:<10}{first_p50:>10.2f}ms{first_p95:>10.2f}ms"
+            f"{total_p50:>10.2f}ms{total_p95:>10.2f}ms"
+        )
+    print(
+        f"graph overhead (p50): first chunk "
+        f"{medians['graph'][0] - medians['direct'][0]:.2f}ms, "
+        f"turn {medians['graph'][1] - medians['direct'][1]:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=100, help="streamed chunks per reply")
+    parser.add_argument("--interval", type=float, default=0.0, help="ms between chunks")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.chunks, args.interval / 1000))
+
+
+if __name__ == "__main__":
+    main()
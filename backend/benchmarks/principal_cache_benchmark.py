@@ -0,0 +1,91 @@
+"""
+Request latency of authenticated endpoints with and without the principal cache.
+
+Sends sequential requests to /api/profile and /api/chat/history through
+the ASGI app (no network) against the configured database, first with
+the principal cache disabled, then enabled, and reports median and p95
+latency. A benchmark user is created if missing.
+
+A SQLite DATABASE_URL (sqlite+aiosqlite) also works and gets its tables
+created, for a run without Postgres.
+
+Usage (from backend/):
+    python -m benchmarks.principal_cache_benchmark
+    python -m benchmarks.principal_cache_benchmark --requests 500
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.principal_cache_benchmark
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlalchemy import select
+
+import app.api.deps as deps
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.database import Base, async_session, engine
+from app.models.profile import Profile
+from app.models.user import User
+from app.services.auth import PrincipalCache, create_access_token
+from main import app
+
+ENDPOINTS = ["/api/profile", "/api/chat/history"]
+BENCH_PHONE = "10000000000"
+
+
+async def _latencies(client: httpx.AsyncClient, path: str, headers: dict, requests: int) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return latencies
+
+
+async def _bench_user_id() -> int:
+    """The benchmark user, created with plain ORM inserts so any database works."""
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        user_id = await db.scalar(select(User.id).where(User.phone == BENCH_PHONE))
+        if user_id is None:
+            user = User(phone=BENCH_PHONE, is_active=True)
+            db.add(user)
+            await db.flush()
+            db.add(Profile(user_id=user.id))
+            await db.commit()
+            user_id = user.id
+    return user_id
+
+
+async def run(requests: int) -> None:
+    user_id = await _bench_user_id()
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+    caches = {
+        "uncached": PrincipalCache(maxsize=1, ttl=0),  # ttl 0: never stores
+        "cached": deps.principal_cache,
+    }
+
+    print(f"{'endpoint':<20}{'mode':<10}{'p50':>10}{'p95':>10}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ENDPOINTS:
+            for mode, cache in caches.items():
+                deps.principal_cache = cache
+                await _latencies(client, path, headers, 10)  # warm up
+                latencies = sorted(await _latencies(client, path, headers, requests))
+                p50 = statistics.median(latencies) * 1000
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+                print(f"{path:<20}{mode:<10}{p50:>8.2f}ms{p95:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt-token and TTFT report for stage-specific prompt variants.
+
+Replays a fixed set of turns for each profile stage with the full prompt
+and with the stage variant, and reports prompt tokens (local estimate)
+and, with --live, time-to-first-token against DashScope.
+
+Usage (from backend/):
+    python -m benchmarks.stage_prompt_report
+    python -m benchmarks.stage_prompt_report --live --repeats 3
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.ai.client import get_chat_model
+from app.ai.context import count_tokens
+from app.ai.prompts import STATIC_SYSTEM_PROMPT, STAGE_PROMPTS, build_user_context
+
+# Fixed replay set: (profile, user message) per stage
+REPLAY_SET: dict[str, list[tuple[dict, str]]] = {
+    "new_user": [
+        ({"current_stage": "new_user"}, "最近总觉得每天都在瞎忙"),
+        ({"current_stage": "new_user"}, "我不知道自己想要什么"),
+    ],
+    "exploring": [
+        ({"current_stage": "exploring", "anti_vision": "五年后还在做不喜欢的工作"},
+         "我想换工作，但又怕换了更差"),
+        ({"current_stage": "exploring", "core_problem": "拖延"},
+         "今天又把计划推到明天了"),
+    ],
+    "established": [
+        ({"current_stage": "established", "vision": "成为独立设计师", "anti_vision": "一辈子打工"},
+         "这周接到了第一个私单，但有点慌"),
+        ({"current_stage": "established", "vision": "每天写作", "anti_vision": "什么都没留下"},
+         "我知道该写，但就是坐不下来"),
+    ],
+}
+
+
+def _system_prompt(prefix: str, profile: dict) -> str:
+    return prefix + f"\n\n## 用户状态\n{build_user_context(profile)}"
+
+
+async def _ttft(system_prompt: str, message: str) -> float:
+    model = get_chat_model(streaming=True)
+    start = time.perf_counter()
+    async for chunk in model.astream([SystemMessage(content=system_prompt), HumanMessage(content=message)]):
+        if chunk.content:
+            return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+async def run(live: bool, repeats: int) -> None:
+    print(f"{'stage':<12}{'full tok':>10}{'stage tok':>11}{'saved':>8}", end="")
+    print(f"{'full ttft':>12}{'stage ttft':>12}" if live else "")
+
+    for stage, turns in REPLAY_SET.items():
+        full_tokens, stage_tokens = [], []
+        full_ttft, stage_ttft = [], []
+        for profile, message in turns:
+            full = _system_prompt(STATIC_SYSTEM_PROMPT, profile)
+            slim = _system_prompt(STAGE_PROMPTS[stage], profile)
+            full_tokens.append(count_tokens(full) + count_tokens(message))
+            stage_tokens.append(count_tokens(slim) + count_tokens(message))
+            if live:
+                for _ in range(repeats):
+                    full_ttft.append(await _ttft(full, message))
+                    stage_ttft.append(await _ttft(slim, message))
+
+        full_avg = statistics.mean(full_tokens)
+        stage_avg = statistics.mean(stage_tokens)
+        line = f"{stage:<12}{full_avg:>10.0f}{stage_avg:>11.0f}{(1 - stage_avg / full_avg):>8.1%}"
+        if live:
+            line += f"{statistics.median(full_ttft) * 1000:>10.0f}ms{statistics.median(stage_ttft) * 1000:>10.0f}ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--live", action="store_true", help="measure TTFT against DashScope")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.live, args.repeats))
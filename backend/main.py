@@ -1,19 +1,62 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import auth, chat, profile, reminder
+from app.core.metrics import metrics
+from app.core.ratelimit import RateLimit, RateLimitMiddleware, RateLimitRule
+from app.ai.client import model_registry
+from app.ai.agent import coaching_threads
+from app.core.redis import close_redis
+from app.services.summary import summarizer
+from app.services.sms import sms_dispatcher
+from app.services.metering import usage_meter
+from app.api.chat_stream import chat_streams
+from app.api import admin, auth, chat, profile, reminder
+from app.api.deps import user_rate_limit_key
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await summarizer.start()
+    await sms_dispatcher.start()
+    await usage_meter.start()
+    await coaching_threads.start()
+    yield
+    await chat_streams.shutdown()
+    await sms_dispatcher.stop()
+    await summarizer.stop()
+    await usage_meter.stop()
+    await coaching_threads.stop()
+    model_registry.close()
+    await close_redis()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     docs_url="/docs" if settings.DEBUG else None,
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    RateLimitMiddleware,
+    rules=[
+        RateLimitRule("send_code", "POST", "/api/auth/send-code",
+                      RateLimit.parse(settings.RATE_LIMIT_SEND_CODE)),
+        RateLimitRule("verify_code", "POST", "/api/auth/verify-code",
+                      RateLimit.parse(settings.RATE_LIMIT_VERIFY_CODE)),
+        RateLimitRule("chat_send", "POST", "/api/chat/send",
+                      RateLimit.parse(settings.RATE_LIMIT_CHAT_SEND), key=user_rate_limit_key),
+    ],
 )
 
+# Outermost, so rejections carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id", "Retry-After"],
 )
 
 # Register routers
@@ -21,8 +64,14 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
 app.include_router(reminder.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "app": settings.APP_NAME}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,14 @@
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.core.database import Base
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path):
+    """Session factory for a throwaway SQLite database with the app's tables."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
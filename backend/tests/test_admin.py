@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import admin
+from app.core.config import settings
+from app.core.database import get_db
+
+
+async def _no_db():
+    yield None
+
+
+async def _no_usage(db, day, limit):
+    return []
+
+
+def _client(monkeypatch, admin_key: str) -> TestClient:
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", admin_key)
+    monkeypatch.setattr(admin, "get_daily_usage", _no_usage)
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.dependency_overrides[get_db] = _no_db
+    return TestClient(app)
+
+
+def test_admin_endpoints_do_not_exist_without_admin_key(monkeypatch):
+    client = _client(monkeypatch, "")
+    assert client.get("/admin/usage").status_code == 404
+    assert client.get("/admin/usage", headers={"X-Admin-Key": ""}).status_code == 404
+
+
+def test_admin_endpoints_check_admin_key(monkeypatch):
+    client = _client(monkeypatch, "secret")
+    assert client.get("/admin/usage").status_code == 403
+    assert client.get("/admin/usage", headers={"X-Admin-Key": "wrong"}).status_code == 403
+
+    response = client.get("/admin/usage", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    assert response.json()["users"] == []
@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionController
+
+
+@pytest.mark.asyncio
+async def test_waiting_users_are_served_round_robin():
+    admission = AdmissionController(limit=1, max_wait=1)
+    assert await admission.acquire(user_id=1)
+
+    served = []
+
+    async def send(user_id):
+        assert await admission.acquire(user_id)
+        served.append(user_id)
+
+    tasks = [asyncio.create_task(send(u)) for u in (1, 1, 1, 2)]
+    await asyncio.sleep(0)
+    for _ in range(4):
+        admission.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert served[:2] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_rejects_after_max_wait():
+    admission = AdmissionController(limit=1, max_wait=0.05)
+    assert await admission.acquire(user_id=1)
+    assert not await admission.acquire(user_id=2)
+    assert admission.stats()["waiting"] == 0
+    admission.release()
+    assert admission.stats()["active"] == 0
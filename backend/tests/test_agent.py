@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+import app.ai.agent as agent
+
+REPLY = "听起来你很在意这件事。[洞察: 害怕让父母失望] 我们慢慢聊。"
+SHOWN = "听起来你很在意这件事。 我们慢慢聊。"
+HISTORY = [{"role": "user", "content": "我总是担心让父母失望"}]
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    """Replies with REPLY; returns the list of prompts the model was sent."""
+    prompts = []
+
+    def get_chat_model(model, streaming=True, temperature=0.7):
+        fake = GenericFakeChatModel(messages=iter([AIMessage(content=REPLY)]))
+
+        def astream(messages):
+            prompts.append(messages)
+            return fake.astream(messages)
+        return SimpleNamespace(astream=astream)
+    monkeypatch.setattr(agent, "get_chat_model", get_chat_model)
+    return prompts
+
+
+@pytest.mark.asyncio
+async def test_stream_runs_through_graph_and_matches_invoke():
+    insights = []
+    chunks = [c async for c in agent.chat_stream_with_agent(HISTORY, {}, insights)]
+    text, invoke_insights = await agent.chat_with_agent(HISTORY, {})
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == text == SHOWN
+    assert insights == invoke_insights == ["害怕让父母失望"]
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_early_stops_graph(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(agent, "record_route", lambda *args: recorded.append(args) or 0.0)
+
+    stream = agent.chat_stream_with_agent(HISTORY, {})
+    assert await anext(stream)
+    await stream.aclose()
+
+    assert len(recorded) == 1
+
+
+@pytest_asyncio.fixture
+async def threads(monkeypatch):
+    threads = agent.CoachingThreads("memory")
+    await threads.start()
+    monkeypatch.setattr(agent, "coaching_threads", threads)
+    yield threads
+    await threads.stop()
+
+
+async def _turn(threads, message_count, summarized_seq, history, text):
+    thread = await threads.load(1, message_count, summarized_seq, max_messages=4)
+    messages = (history if thread.messages is None else []) + [{"role": "user", "content": text}]
+    async for _ in agent.chat_stream_with_agent(messages, {}, thread=thread):
+        pass
+    return thread
+
+
+@pytest.mark.asyncio
+async def test_thread_is_seeded_then_only_appended(threads, fake_model):
+    history = [{"role": "user", "content": "m1"}, {"role": "assistant", "content": "m2"}]
+
+    thread = await _turn(threads, 2, 0, history, "m3")
+    assert thread.messages is None
+
+    thread = await _turn(threads, 4, 0, history, "m5")
+    assert [m.content for m in thread.messages] == ["m1", "m2", "m3", SHOWN]
+    # System prompt, checkpointed history, new message
+    assert [m.content for m in fake_model[-1][1:]] == ["m1", "m2", "m3", SHOWN, "m5"]
+
+
+@pytest.mark.asyncio
+async def test_thread_is_trimmed_to_unsummarized_window(threads, fake_model):
+    history = [{"role": "user", "content": "m1"}, {"role": "assistant", "content": "m2"}]
+    await _turn(threads, 2, 0, history, "m3")
+    await _turn(threads, 4, 0, [], "m5")
+
+    # Two messages summarized, at most four kept before the new one
+    thread = await _turn(threads, 6, 2, [], "m7")
+    assert len(thread.messages) == 6
+    assert [m.content for m in fake_model[-1][1:]] == ["m3", SHOWN, "m5", SHOWN, "m7"]
+
+    state = await threads.graph.aget_state(agent._thread_config(1))
+    assert state.values["last_seq"] == 8
+    assert len(state.values["messages"]) == 6
+
+
+@pytest.mark.asyncio
+async def test_stale_thread_is_reseeded(threads):
+    await _turn(threads, 0, 0, [], "m1")
+
+    # Messages were written without going through the thread
+    thread = await threads.load(1, 5, 0, max_messages=4)
+    assert thread.messages is None
+    assert (await threads.load(1, 2, 0, max_messages=4)).messages is not None
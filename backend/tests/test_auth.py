@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.services.auth import get_or_create_user
+
+
+class CapturingSession:
+    """Records executed statements and answers with a fixed user id."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return self
+
+    def scalar_one_or_none(self):
+        return 7
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_user_upsert_binds_every_not_null_column():
+    db = CapturingSession()
+    assert await get_or_create_user(db, "13800000000") == 7
+
+    compiled = db.statements[0].compile(dialect=postgresql.asyncpg.dialect())
+    # Python-side column defaults are not applied inside the CTE inserts
+    assert "INSERT INTO profiles (user_id, current_stage)" in str(compiled)
+    # $1 current_stage, $2 phone, $3 is_active, $4 phone, $5 limit
+    params = [compiled.params[name] for name in compiled.positiontup]
+    assert params == ["new_user", "13800000000", True, "13800000000", 1]
@@ -0,0 +1,26 @@
+import pytest
+from fastapi import HTTPException
+from app.api import chat
+from app.api.chat_stream import chat_streams
+from app.services.auth import Principal
+from app.services.turn_lock import turn_locks
+
+
+@pytest.mark.asyncio
+async def test_send_over_daily_quota_is_rejected_and_frees_the_turn(monkeypatch):
+    async def over_quota(db, user_id):
+        return False
+
+    monkeypatch.setattr(chat, "within_daily_quota", over_quota)
+    user = Principal(id=1, phone="13800000000", is_active=True)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await chat.send_message(chat.ChatRequest(message="hi"), None, "key-1", user, None)
+    assert exc_info.value.status_code == 429
+
+    # The turn lock is released and the key freed, so a retry starts over
+    token = await turn_locks.acquire(user.id, timeout=0.1)
+    assert token is not None
+    await turn_locks.release(user.id, token)
+    _, created = await chat_streams.open(user.id, "key-1")
+    assert created
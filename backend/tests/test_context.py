@@ -0,0 +1,51 @@
+from app.ai.context import count_tokens, fit_context, truncate_to_tokens
+
+
+def _turns(n: int, size: int = 50) -> list[dict]:
+    messages = []
+    for i in range(n):
+        messages.append({"role": "user", "content": "问" * size})
+        messages.append({"role": "assistant", "content": "答" * size})
+    return messages
+
+
+def test_count_tokens_cjk_and_ascii():
+    assert count_tokens("") == 0
+    assert count_tokens("你好") == 2
+    assert count_tokens("abcdefgh") == 2
+
+
+def test_truncate_keeps_head_or_tail():
+    text = "一二三四五六七八九十"
+    assert truncate_to_tokens(text, 5).startswith("一二三")
+    assert truncate_to_tokens(text, 5, keep="tail").endswith("八九十")
+    assert truncate_to_tokens(text, 100) == text
+
+
+def test_everything_fits():
+    window = fit_context("系统", "摘要", _turns(3), max_prompt_tokens=10000, keep_turns=2)
+    assert len(window.messages) == 6
+    assert window.summary == "摘要"
+    assert window.dropped == 0
+
+
+def test_hard_ceiling_drops_oldest_first():
+    messages = _turns(20)
+    window = fit_context("系统" * 100, "摘要" * 50, messages, max_prompt_tokens=1000, keep_turns=3)
+    assert window.prompt_tokens <= 1000
+    assert window.messages == messages[-len(window.messages):]
+    assert window.dropped == len(messages) - len(window.messages)
+
+
+def test_long_summary_is_shortened_but_recent_turns_kept():
+    window = fit_context("系统", "旧" * 5000, _turns(3), max_prompt_tokens=1200, keep_turns=3)
+    assert window.prompt_tokens <= 1200
+    assert len(window.messages) == 6
+    assert window.summary.startswith("…")
+
+
+def test_oversized_last_message_is_truncated():
+    messages = [{"role": "user", "content": "长" * 5000}]
+    window = fit_context("系统", None, messages, max_prompt_tokens=500, keep_turns=3)
+    assert window.prompt_tokens <= 500
+    assert len(window.messages) == 1
@@ -0,0 +1,31 @@
+import pytest
+from app.services.idempotency import InMemoryIdempotencyStore
+from app.api.chat_stream import ChatStreams, InMemoryStreamBuffer
+
+
+@pytest.mark.asyncio
+async def test_first_claim_wins():
+    store = InMemoryIdempotencyStore(ttl=60)
+    assert await store.claim("1:k", "stream-a") is None
+    assert await store.claim("1:k", "stream-b") == "stream-a"
+    assert await store.claim("2:k", "stream-c") is None
+
+
+@pytest.mark.asyncio
+async def test_expired_key_can_be_claimed_again():
+    store = InMemoryIdempotencyStore(ttl=0)
+    assert await store.claim("1:k", "stream-a") is None
+    assert await store.claim("1:k", "stream-b") is None
+
+
+@pytest.mark.asyncio
+async def test_retry_reuses_stream_without_creating_another():
+    buffer = InMemoryStreamBuffer(ttl=60)
+    streams = ChatStreams(buffer, InMemoryIdempotencyStore(ttl=60), grace=1, poll_interval=1)
+
+    stream_id, created = await streams.open(1, "k")
+    assert created and await buffer.owner(stream_id) == 1
+
+    retry_id, created = await streams.open(1, "k")
+    assert (retry_id, created) == (stream_id, False)
+    assert len(buffer._streams) == 1
@@ -0,0 +1,111 @@
+from datetime import date
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.core.config import settings
+from app.models.llm_usage import LLMUsage
+from app.services import metering
+from app.services.metering import UsageMeter, UsageTotals, usage_day, within_daily_quota
+
+USAGE = {"prompt_tokens": 100, "completion_tokens": 20, "cached_tokens": 40}
+
+
+def test_record_sums_calls_per_rollup():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    meter.record(1, "qwen-plus", "chat", USAGE, cost=0.001, latency=0.5, first_token_latency=0.2, prompt_variant="new_user")
+    meter.record(1, "qwen-plus", "chat", USAGE, cost=0.002, latency=1.5, prompt_variant="new_user")
+    meter.record(1, "qwen-turbo", "summary", None, cost=0.0, latency=0.3)
+
+    assert meter.stats() == {"pending_rollups": 2}
+    totals = meter._pending[(1, usage_day(), "qwen-plus", "chat", "new_user")]
+    assert totals == UsageTotals(
+        calls=2, prompt_tokens=200, completion_tokens=40, cached_tokens=80,
+        cost_micro_cny=3000, latency_ms=2000, ttft_ms=200, streamed_calls=1,
+    )
+
+
+def test_pending_tokens_is_per_user_and_day():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    meter.record(1, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+    meter.record(1, "qwen-max", "chat", USAGE, cost=0.0, latency=0.1)
+    meter.record(2, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+
+    assert meter.pending_tokens(1, usage_day()) == 240
+    assert meter.pending_tokens(2, usage_day()) == 120
+    assert meter.pending_tokens(1, date(2000, 1, 1)) == 0
+
+
+def test_record_requests_flush_when_too_many_rollups():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=2)
+    meter.record(1, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+    assert not meter._flush_now.is_set()
+    meter.record(2, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+    assert meter._flush_now.is_set()
+
+
+def test_record_clips_labels_to_column_lengths():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    meter.record(1, "m" * 60, "p" * 30, USAGE, cost=0.0, latency=0.1, prompt_variant="v" * 30)
+
+    [(_, _, model, purpose, variant)] = meter._pending
+    assert (model, purpose, variant) == ("m" * 50, "p" * 20, "v" * 20)
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_counts_flushed_and_pending_tokens(sessions, monkeypatch):
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    monkeypatch.setattr(metering, "usage_meter", meter)
+    monkeypatch.setattr(settings, "USAGE_DAILY_TOKEN_QUOTA", 300)
+    async with sessions() as db:
+        db.add(LLMUsage(
+            user_id=1, day=usage_day(), model="qwen-plus", purpose="chat", prompt_variant="",
+            calls=1, prompt_tokens=100, completion_tokens=80, cached_tokens=0,
+            cost_micro_cny=0, latency_ms=0, ttft_ms=0, streamed_calls=0,
+        ))
+        await db.commit()
+
+        assert await within_daily_quota(db, 1)
+        meter.record(1, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+        assert not await within_daily_quota(db, 1)
+        assert await within_daily_quota(db, 2)
+
+        monkeypatch.setattr(settings, "USAGE_DAILY_TOKEN_QUOTA", 0)
+        assert await within_daily_quota(db, 1)
+
+
+def _failing_writer(meter: UsageMeter, error: Exception, bad_user_id: int):
+    """Replaces meter._write; batches containing `bad_user_id` raise `error`."""
+    written = []
+
+    async def write(batch):
+        if any(key[0] == bad_user_id for key in batch):
+            raise error
+        written.extend(batch)
+
+    meter._write = write
+    return written
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_rows_the_database_rejects():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    written = _failing_writer(meter, IntegrityError("INSERT", {}, Exception("fk")), bad_user_id=2)
+    for user_id in (1, 2, 3):
+        meter.record(user_id, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+
+    await meter.flush()
+    assert [key[0] for key in written] == [1, 3]
+    assert meter.stats() == {"pending_rollups": 0}
+
+
+@pytest.mark.asyncio
+async def test_flush_keeps_rows_on_transient_errors():
+    meter = UsageMeter(flush_interval=60, flush_max_keys=100)
+    written = _failing_writer(meter, OperationalError("INSERT", {}, Exception("down")), bad_user_id=2)
+    meter.record(1, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+    meter.record(2, "qwen-plus", "chat", USAGE, cost=0.0, latency=0.1)
+
+    with pytest.raises(OperationalError):
+        await meter.flush()
+    assert written == []
+    assert meter.pending_tokens(1, usage_day()) == 120
+    assert meter.pending_tokens(2, usage_day()) == 120
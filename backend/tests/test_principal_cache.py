@@ -0,0 +1,22 @@
+import time
+from app.services.auth import Principal, PrincipalCache
+
+
+def test_invalidate_user_drops_all_their_tokens():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    alice = Principal(id=1, phone="1", is_active=True)
+    bob = Principal(id=2, phone="2", is_active=True)
+    expires_at = time.time() + 3600
+    cache.set("a1", alice, expires_at)
+    cache.set("a2", alice, expires_at)
+    cache.set("b1", bob, expires_at)
+
+    cache.invalidate_user(1)
+    assert cache.get("a1") is None and cache.get("a2") is None
+    assert cache.get("b1") == bob
+
+
+def test_expired_token_is_not_cached():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set("t", Principal(id=1, phone="1", is_active=True), time.time() - 1)
+    assert cache.get("t") is None
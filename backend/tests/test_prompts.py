@@ -0,0 +1,74 @@
+import pytest
+from app.ai.prompts import (
+    InsightMarkerFilter,
+    clean_insight_markers,
+    extract_insights_from_response,
+)
+
+
+RESPONSES = [
+    "这种感觉不容易觉察。你是什么时候意识到的？[洞察: 察觉对失败的恐惧]",
+    "[洞察: 开头]嗯，后来呢？[洞察: 第二个]",
+    "数组写法 a[0] 不是标记，[洞 也不是",
+    "没有结尾的标记 [洞察: 还没写完",
+    "没有洞察的普通回复",
+]
+
+
+def _stream(text: str, size: int) -> tuple[str, list[str]]:
+    marker_filter = InsightMarkerFilter()
+    out = [marker_filter.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    out.append(marker_filter.flush())
+    return "".join(out), marker_filter.insights
+
+
+@pytest.mark.parametrize("text", RESPONSES)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_filter_matches_full_text_helpers(text, size):
+    cleaned, insights = _stream(text, size)
+    assert cleaned.strip() == clean_insight_markers(text)
+    assert insights == extract_insights_from_response(text)
+
+
+def test_filter_holds_back_only_marker_prefix():
+    marker_filter = InsightMarkerFilter()
+    assert marker_filter.feed("好的[洞") == "好的"
+    assert marker_filter.feed("察: 决心]继续") == "继续"
+    assert marker_filter.insights == ["决心"]
+
+
+def test_system_prompt_shares_static_prefix():
+    from app.ai.prompts import STATIC_SYSTEM_PROMPT, build_system_prompt
+
+    first = build_system_prompt("阶段：新用户")
+    second = build_system_prompt("阶段：已有目标\n昵称：{name}")
+    assert first.startswith(STATIC_SYSTEM_PROMPT)
+    assert second.startswith(STATIC_SYSTEM_PROMPT)
+    assert second.endswith("昵称：{name}")
+
+
+def test_prompt_builder_is_deterministic_and_memoized():
+    from app.ai.prompts import PromptBuilder, STATIC_SYSTEM_PROMPT
+
+    forward = PromptBuilder().enable_only("templates", "identity", "language_style")
+    backward = PromptBuilder().enable_only("language_style", "identity", "templates")
+    assert forward.build_prefix() is backward.build_prefix()
+    assert forward.enabled_modules() == ["identity", "templates", "language_style"]
+    assert PromptBuilder().build_prefix() == STATIC_SYSTEM_PROMPT
+
+
+def test_prompt_builder_token_report():
+    from app.ai.prompts import PromptBuilder
+
+    report = PromptBuilder().disable("templates").token_report()
+    assert "templates" not in report
+    assert report["total"] >= sum(v for k, v in report.items() if k != "total")
+
+
+def test_stage_prompts_are_precompiled_and_smaller():
+    from app.ai.prompts import STAGE_PROMPTS, STATIC_SYSTEM_PROMPT, build_system_prompt
+
+    assert STAGE_PROMPTS["new_user"] == STATIC_SYSTEM_PROMPT
+    assert len(STAGE_PROMPTS["established"]) < len(STAGE_PROMPTS["exploring"]) < len(STATIC_SYSTEM_PROMPT)
+    assert build_system_prompt("x", "established").startswith(STAGE_PROMPTS["established"])
+    assert build_system_prompt("x", "unknown").startswith(STATIC_SYSTEM_PROMPT)
@@ -0,0 +1,19 @@
+import pytest
+from app.core.ratelimit import InMemoryRateLimiter, RateLimit
+
+
+def test_parse_rate():
+    limit = RateLimit.parse("5/minute")
+    assert limit.capacity == 5
+    assert limit.rate == pytest.approx(5 / 60)
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_reports_wait():
+    limiter = InMemoryRateLimiter()
+    limit = RateLimit.parse("2/minute")
+    assert await limiter.hit("ip:1", limit) == 0
+    assert await limiter.hit("ip:1", limit) == 0
+    wait = await limiter.hit("ip:1", limit)
+    assert 0 < wait <= 30
+    assert await limiter.hit("ip:2", limit) == 0
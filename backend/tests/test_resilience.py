@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk
+from app.ai import resilience
+from app.ai.resilience import (
+    BreakerRegistry,
+    CircuitBreaker,
+    DeadlineExceeded,
+    invoke_with_failover,
+    stream_with_failover,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "breakers", BreakerRegistry(failure_threshold=2, recovery_time=60))
+
+
+def test_breaker_opens_then_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # probe already in flight
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def _stream(delay: float, parts: list[str]):
+    await asyncio.sleep(delay)
+    for part in parts:
+        yield AIMessageChunk(content=part)
+
+
+async def _collect(stream):
+    return [(model, chunk.content) async for model, chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_slow_first_token_fails_over():
+    streams = {"slow": _stream(1, ["late"]), "fast": _stream(0, ["a", "b"])}
+    out = await _collect(stream_with_failover(streams.pop, ["slow", "fast"], 0.05, 5))
+    assert out == [("fast", "a"), ("fast", "b")]
+    assert resilience.breakers.get("slow").stats()["consecutive_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_is_skipped_and_deadline_raises():
+    resilience.breakers.get("bad").record_failure()
+    resilience.breakers.get("bad").record_failure()
+    out = await _collect(stream_with_failover(lambda m: _stream(0, ["ok"]), ["bad", "good"], 1, 5))
+    assert out == [("good", "ok")]
+
+    with pytest.raises(DeadlineExceeded):
+        await _collect(stream_with_failover(lambda m: _stream(1, ["x"]), ["good"], 0.05, 5))
+
+
+@pytest.mark.asyncio
+async def test_hung_primary_invoke_fails_over_within_deadline():
+    async def invoke(model):
+        if model == "qwen-max":
+            await asyncio.sleep(10)
+        return f"answer from {model}"
+
+    start = asyncio.get_running_loop().time()
+    model, result = await invoke_with_failover(invoke, ["qwen-max", "qwen-plus"], total_timeout=0.2)
+    assert (model, result) == ("qwen-plus", "answer from qwen-plus")
+    assert asyncio.get_running_loop().time() - start < 0.2
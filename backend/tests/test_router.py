@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from app.ai import router
+from app.ai.router import RouteDecision, estimate_cost, record_route, route_turn, router_stats
+from app.core.metrics import Metrics
+
+
+def test_acknowledgement_goes_fast():
+    assert route_turn("好的！", "exploring").model == "qwen-turbo"
+    assert route_turn("OK", "new_user").reason == "acknowledgement"
+
+
+def test_reflection_and_long_messages_go_deep():
+    assert route_turn("我发现自己一直在逃避", "established").reason == "insight_likely"
+    assert route_turn("今天" * 120, "exploring").reason == "long_message"
+
+
+def test_stage_rules():
+    assert route_turn("今天怎么开始", "new_user").model == "qwen-plus"
+    assert route_turn("今天怎么开始", "established").reason == "short_followup"
+    assert route_turn("今天要不要先把简历改完再说", "exploring").reason == "default"
+
+
+def test_estimate_cost():
+    usage = {"prompt_tokens": 1000, "completion_tokens": 1000}
+    assert estimate_cost("qwen-plus", usage) == 0.0028
+    assert estimate_cost("unknown", usage) == 0.0
+
+
+def test_avg_ttft_counts_only_turns_with_a_first_token(monkeypatch):
+    monkeypatch.setattr(router, "metrics", Metrics())
+    decision = RouteDecision(model="qwen-plus", reason="default")
+    record_route(decision, latency=1.0, first_token_latency=0.2, usage=None)
+    record_route(decision, latency=3.0, first_token_latency=None, usage=None)
+
+    stats = router_stats()["qwen-plus"]
+    assert stats["turns"] == 2
+    assert stats["avg_latency_ms"] == 2000
+    assert stats["avg_ttft_ms"] == 200
+
+    record_route(RouteDecision(model="qwen-max", reason="default"), 1.0, None, None)
+    assert router_stats()["qwen-max"]["avg_ttft_ms"] is None
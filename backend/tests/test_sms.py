@@ -1,5 +1,8 @@
+import asyncio
+import logging
 import pytest
-from app.services.sms import SMSService
+from app.core.config import settings
+from app.services.sms import FakeSMSProvider, LogSMSProvider, SMSDispatcher, SMSMessage, SMSService
 
 
 @pytest.fixture
@@ -16,3 +19,48 @@ def test_generate_code_length(sms_service):
 def test_generate_code_randomness(sms_service):
     codes = {sms_service.generate_code() for _ in range(100)}
     assert len(codes) > 90  # Should be mostly unique
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_batches_queued_codes():
+    provider = FakeSMSProvider(max_batch_size=10)
+    dispatcher = SMSDispatcher(provider, workers=1, queue_size=100, max_retries=0, retry_backoff=0)
+    for i in range(25):
+        assert dispatcher.enqueue(f"1380000{i:04d}", "123456")
+
+    await dispatcher.start()
+    await dispatcher.stop()
+    assert len(provider.sent) == 25
+    assert provider.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_failed_batches():
+    provider = FakeSMSProvider(fail_rate=1.0)
+    dispatcher = SMSDispatcher(provider, workers=1, queue_size=100, max_retries=2, retry_backoff=0.01)
+    await dispatcher.start()
+    dispatcher.enqueue("13800000000", "123456")
+    await asyncio.sleep(0.2)
+    await dispatcher.stop()
+    assert provider.calls == 3  # first attempt + 2 retries
+    assert provider.sent == []
+
+
+def test_enqueue_rejects_when_queue_full():
+    dispatcher = SMSDispatcher(FakeSMSProvider(), workers=1, queue_size=1, max_retries=0, retry_backoff=0)
+    assert dispatcher.enqueue("13800000000", "123456")
+    assert not dispatcher.enqueue("13800000001", "123456")
+
+
+@pytest.mark.asyncio
+async def test_log_provider_logs_codes_only_in_debug(monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger="app.services.sms")
+    messages = [SMSMessage(phone="13800000000", code="123456")]
+
+    monkeypatch.setattr(settings, "DEBUG", False)
+    await LogSMSProvider().send_batch(messages)
+    assert "123456" not in caplog.text
+
+    monkeypatch.setattr(settings, "DEBUG", True)
+    await LogSMSProvider().send_batch(messages)
+    assert "SMS code 123456 to 13800000000" in caplog.text
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from app.api.streaming import ClientDisconnected, format_sse, stream_until_disconnect
+from app.api.chat_stream import InMemoryStreamBuffer
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+async def slow_stream(state: dict):
+    try:
+        for i in range(100):
+            await asyncio.sleep(0.05)
+            yield str(i)
+    finally:
+        state["closed"] = True
+
+
+@pytest.mark.asyncio
+async def test_relays_complete_stream():
+    async def chunks():
+        for part in ["a", "b", "c"]:
+            yield part
+
+    out = [c async for c in stream_until_disconnect(FakeRequest(), chunks(), 0.01)]
+    assert out == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_closes_upstream_within_poll_interval():
+    request = FakeRequest()
+    state = {}
+    received = []
+
+    with pytest.raises(ClientDisconnected):
+        async for chunk in stream_until_disconnect(request, slow_stream(state), 0.02):
+            received.append(chunk)
+            if len(received) == 2:
+                request.disconnected = True
+
+    assert state["closed"]
+    assert len(received) <= 3
+
+
+def test_format_sse_splits_multiline_data():
+    assert format_sse(3, "a\nb") == "id: 3\ndata: a\ndata: b\n\n"
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_resumes_after_last_event():
+    buffer = InMemoryStreamBuffer(ttl=60)
+    await buffer.create("s", owner_id=1)
+    for event_id, data in enumerate(["a", "b"], start=1):
+        await buffer.append("s", event_id, data)
+
+    async def finish():
+        await asyncio.sleep(0.05)
+        await buffer.append("s", 3, "c")
+        await buffer.append("s", 4, "[DONE]")
+
+    task = asyncio.create_task(finish())
+    events = [e async for e in buffer.read("s", after_id=1)]
+    await task
+    assert events == [(2, "b"), (3, "c"), (4, "[DONE]")]
+    assert await buffer.owner("s") == 1
+    assert await buffer.owner("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_reader_ends_when_entry_is_evicted_mid_stream():
+    buffer = InMemoryStreamBuffer(ttl=60, maxsize=1, check_interval=0.01)
+    await buffer.create("s", owner_id=1)
+    await buffer.append("s", 1, "a")
+
+    async def evict():
+        await asyncio.sleep(0.05)
+        await buffer.create("other", owner_id=2)
+
+    task = asyncio.create_task(evict())
+    async with asyncio.timeout(1):
+        events = [e async for e in buffer.read("s", after_id=0)]
+    await task
+    assert events == [(1, "a"), (2, "[ERROR] stream expired")]
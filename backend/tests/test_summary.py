@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+from sqlalchemy import update
+import app.services.summary as summary
+from app.core.config import settings
+from app.models import Conversation, Message, User
+from app.services.summary import SummarizerWorker, fold_conversation_summary
+
+WINDOW = settings.CONTEXT_KEEP_TURNS * 2
+
+
+@pytest.fixture
+def calls(monkeypatch, sessions):
+    """Routes the summarizer to the test DB; records summarize_conversation calls."""
+    calls = []
+
+    async def summarize_conversation(prior_summary, messages, user_id=None):
+        calls.append([m["content"] for m in messages])
+        return f"summary {len(calls)}", ["insight a", f"insight {len(calls)}"]
+
+    monkeypatch.setattr(summary, "async_session", sessions)
+    monkeypatch.setattr(summary, "summarize_conversation", summarize_conversation)
+    return calls
+
+
+async def _conversation(sessions, message_count: int, **fields) -> int:
+    async with sessions() as db:
+        user = User(phone=f"1{message_count:010d}")
+        db.add(user)
+        await db.flush()
+        conversation = Conversation(user_id=user.id, message_count=message_count, **fields)
+        db.add(conversation)
+        await db.flush()
+        db.add_all(
+            Message(conversation_id=conversation.id, seq=seq, role="user", content=f"m{seq}")
+            for seq in range(1, message_count + 1)
+        )
+        await db.commit()
+        return conversation.id
+
+
+async def _get(sessions, conversation_id: int) -> Conversation:
+    async with sessions() as db:
+        return await db.get(Conversation, conversation_id)
+
+
+@pytest.mark.asyncio
+async def test_no_fold_below_threshold(sessions, calls):
+    conversation_id = await _conversation(sessions, WINDOW + settings.SUMMARY_FOLD_MIN_MESSAGES - 1)
+    assert not await fold_conversation_summary(conversation_id)
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_folds_in_batches_up_to_window(sessions, calls):
+    backlog = settings.SUMMARY_FOLD_MAX_MESSAGES + 5
+    conversation_id = await _conversation(sessions, WINDOW + backlog)
+
+    assert await fold_conversation_summary(conversation_id)
+    assert [len(batch) for batch in calls] == [settings.SUMMARY_FOLD_MAX_MESSAGES, 5]
+    assert calls[0][0] == "m1"
+
+    conversation = await _get(sessions, conversation_id)
+    assert conversation.summarized_seq == backlog
+    assert conversation.summary == "summary 2"
+    assert conversation.extracted_insights == ["insight a", "insight 1", "insight 2"]
+
+
+@pytest.mark.asyncio
+async def test_insights_are_merged_without_duplicates(sessions, calls):
+    conversation_id = await _conversation(
+        sessions, WINDOW + settings.SUMMARY_FOLD_MIN_MESSAGES,
+        extracted_insights=["insight a", "old"],
+    )
+    assert await fold_conversation_summary(conversation_id)
+    conversation = await _get(sessions, conversation_id)
+    assert conversation.extracted_insights == ["insight a", "old", "insight 1"]
+
+
+@pytest.mark.asyncio
+async def test_fold_lands_when_a_turn_is_appended_meanwhile(sessions, calls, monkeypatch):
+    conversation_id = await _conversation(sessions, WINDOW + settings.SUMMARY_FOLD_MIN_MESSAGES)
+
+    async def summarize_during_new_turn(prior_summary, messages, user_id=None):
+        calls.append(messages)
+        if len(calls) == 1:
+            async with sessions() as db:
+                conversation = await db.get(Conversation, conversation_id)
+                conversation.message_count += 1
+                conversation.version += 1
+                db.add(Message(
+                    conversation_id=conversation_id, seq=conversation.message_count,
+                    role="user", content="new turn",
+                ))
+                await db.commit()
+        return f"folded {len(calls)}", []
+
+    monkeypatch.setattr(summary, "summarize_conversation", summarize_during_new_turn)
+    assert await fold_conversation_summary(conversation_id)
+    # The first fold lands; the message the new turn pushed out is folded next
+    assert [len(batch) for batch in calls] == [settings.SUMMARY_FOLD_MIN_MESSAGES, 1]
+    conversation = await _get(sessions, conversation_id)
+    assert conversation.summary == "folded 2"
+    assert conversation.summarized_seq == settings.SUMMARY_FOLD_MIN_MESSAGES + 1
+
+
+@pytest.mark.asyncio
+async def test_fold_is_dropped_when_history_is_cleared_meanwhile(sessions, calls, monkeypatch):
+    conversation_id = await _conversation(sessions, WINDOW + settings.SUMMARY_FOLD_MIN_MESSAGES)
+
+    async def summarize_during_clear(prior_summary, messages, user_id=None):
+        async with sessions() as db:
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(message_count=0, summarized_seq=0, version=Conversation.version + 1)
+            )
+            await db.commit()
+        return "stale", []
+
+    monkeypatch.setattr(summary, "summarize_conversation", summarize_during_clear)
+    assert not await fold_conversation_summary(conversation_id)
+    conversation = await _get(sessions, conversation_id)
+    assert (conversation.summary, conversation.summarized_seq) == (None, 0)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_dedupes_and_drops_when_full():
+    worker = SummarizerWorker(concurrency=1, queue_size=2, sweep_interval=0)
+    assert worker.enqueue(1) and worker.enqueue(1)
+    assert worker.stats()["queued"] == 1
+    assert worker.enqueue(2)
+    assert not worker.enqueue(3)
+
+
+@pytest.mark.asyncio
+async def test_sweep_finds_backlog_and_workers_fold_it(sessions, calls, monkeypatch):
+    behind = await _conversation(sessions, WINDOW + settings.SUMMARY_FOLD_MIN_MESSAGES)
+    await _conversation(sessions, WINDOW)  # nothing to fold
+
+    worker = SummarizerWorker(concurrency=1, queue_size=10, sweep_interval=0.01)
+    await worker.start()
+    try:
+        for _ in range(100):
+            if (await _get(sessions, behind)).summarized_seq:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await worker.stop()
+
+    assert (await _get(sessions, behind)).summarized_seq == settings.SUMMARY_FOLD_MIN_MESSAGES
+    assert len(calls) == 1
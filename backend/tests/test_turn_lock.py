@@ -0,0 +1,17 @@
+import asyncio
+import pytest
+from app.services.turn_lock import InMemoryTurnLock
+
+
+@pytest.mark.asyncio
+async def test_second_turn_waits_for_the_first():
+    locks = InMemoryTurnLock()
+    token = await locks.acquire(1, timeout=1)
+    assert token is not None
+    assert await locks.acquire(1, timeout=0.05) is None
+    assert await locks.acquire(2, timeout=0.05) is not None
+
+    waiter = asyncio.create_task(locks.acquire(1, timeout=1))
+    await asyncio.sleep(0.01)
+    await locks.release(1, token)
+    assert await waiter is not None
@@ -0,0 +1,38 @@
+import pytest
+from app.services.verification import InMemoryCodeStore
+
+
+@pytest.mark.asyncio
+async def test_code_is_consumed_on_success():
+    store = InMemoryCodeStore(ttl=60, max_attempts=5)
+    await store.put("13800000000", "123456")
+    assert not await store.check("13800000000", "000000")
+    assert await store.check("13800000000", "123456")
+    assert not await store.check("13800000000", "123456")
+
+
+@pytest.mark.asyncio
+async def test_new_code_replaces_old_and_codes_expire():
+    store = InMemoryCodeStore(ttl=60, max_attempts=5)
+    await store.put("13800000000", "111111")
+    await store.put("13800000000", "222222")
+    assert not await store.check("13800000000", "111111")
+
+    expired = InMemoryCodeStore(ttl=0, max_attempts=5)
+    await expired.put("13800000000", "123456")
+    assert not await expired.check("13800000000", "123456")
+
+
+@pytest.mark.asyncio
+async def test_code_is_invalidated_after_max_wrong_attempts():
+    store = InMemoryCodeStore(ttl=60, max_attempts=3)
+    await store.put("13800000000", "123456")
+    for _ in range(3):
+        assert not await store.check("13800000000", "000000")
+    assert not await store.check("13800000000", "123456")
+
+    # A new code starts a fresh count
+    await store.put("13800000000", "654321")
+    for _ in range(2):
+        assert not await store.check("13800000000", "000000")
+    assert await store.check("13800000000", "654321")
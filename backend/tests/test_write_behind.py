@@ -0,0 +1,67 @@
+import asyncio
+import gc
+from contextlib import nullcontext
+import pytest
+import app.services.write_behind as write_behind
+from app.services.write_behind import WriteBehind
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    monkeypatch.setattr(write_behind, "async_session", lambda: nullcontext("db"))
+
+
+def _write(applied: list, name: str, delay: float = 0.0, error: Exception | None = None):
+    async def write(db):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        applied.append(name)
+    return write
+
+
+@pytest.mark.asyncio
+async def test_writes_apply_in_submission_order():
+    applied = []
+    writes = WriteBehind()
+    writes.submit(_write(applied, "a", delay=0.03))
+    writes.submit(_write(applied, "b", delay=0.01))
+    writes.submit(_write(applied, "c"))
+    await writes.flush()
+    assert applied == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_failure_is_raised_and_later_writes_are_skipped():
+    applied = []
+    writes = WriteBehind()
+    writes.submit(_write(applied, "a"))
+    writes.submit(_write(applied, "b", error=ValueError("boom")))
+    writes.submit(_write(applied, "c"))
+    writes.submit(_write(applied, "d"))
+
+    with pytest.raises(ValueError, match="boom"):
+        await writes.flush()
+    assert applied == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_flush_after_error_retrieves_every_task_and_starts_fresh():
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda loop, context: unretrieved.append(context))
+
+    applied = []
+    writes = WriteBehind()
+    writes.submit(_write(applied, "a", error=ValueError("boom")))
+    writes.submit(_write(applied, "b"))
+    with pytest.raises(ValueError):
+        await writes.flush()
+
+    writes.submit(_write(applied, "c"))
+    await writes.flush()
+    assert applied == ["c"]
+
+    gc.collect()
+    loop.set_exception_handler(None)
+    assert unretrieved == []
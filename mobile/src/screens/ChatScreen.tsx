@@ -31,7 +31,7 @@ export default function ChatScreen() {
     setIsLoading(true);
     try {
       const history = await chatService.getHistory();
-      setMessages(history);
+      setMessages(history.messages);
     } catch (error) {
       console.error('加载历史消息失败:', error);
     } finally {
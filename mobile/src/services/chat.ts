@@ -1,5 +1,5 @@
 import { api } from '../config/api';
-import { Message } from '../types';
+import { HistoryPage } from '../types';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 
 export const chatService = {
@@ -8,50 +8,132 @@ export const chatService = {
     return response.data.message;
   },
 
-  async getHistory(): Promise<Message[]> {
-    const response = await api.get('/api/chat/history');
-    return response.data.messages;
+  // 不传游标时返回最近一页；beforeId 向前翻页；afterId 只拉取上次看到之后的新消息
+  async getHistory(
+    options: { limit?: number; beforeId?: number; afterId?: number } = {}
+  ): Promise<HistoryPage> {
+    const response = await api.get('/api/chat/history', {
+      params: {
+        limit: options.limit,
+        before_id: options.beforeId,
+        after_id: options.afterId,
+      },
+    });
+    return {
+      messages: response.data.messages,
+      hasMore: response.data.has_more,
+    };
   },
 
   async clearHistory(): Promise<void> {
     await api.delete('/api/chat/history');
   },
 
+  // 回复在服务端独立生成；连接中断时凭 X-Stream-Id 和最后收到的事件 id 续传
   async sendMessage(
     message: string,
     onChunk: (chunk: string) => void
   ): Promise<void> {
     const token = await AsyncStorage.getItem('token');
+    const headers = { 'Authorization': `Bearer ${token}` };
 
-    const response = await fetch(`${api.defaults.baseURL}/api/chat/send`, {
+    // 同一条消息重试时带相同的 key，服务端只会保存并生成一次
+    const idempotencyKey = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    const send = () => fetch(`${api.defaults.baseURL}/api/chat/send`, {
       method: 'POST',
       headers: {
+        ...headers,
         'Content-Type': 'application/json',
-        'Authorization': `Bearer ${token}`,
+        'Idempotency-Key': idempotencyKey,
       },
       body: JSON.stringify({ message }),
     });
 
-    const reader = response.body?.getReader();
-    const decoder = new TextDecoder();
+    let response: Response;
+    for (let attempt = 0; ; attempt++) {
+      try {
+        response = await send();
+        break;
+      } catch (error) {
+        if (attempt >= MAX_RESUME_ATTEMPTS) throw error;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+      }
+    }
+    const streamId = response.headers.get('X-Stream-Id');
+    const state: StreamState = { lastEventId: 0, finished: false };
 
-    if (!reader) throw new Error('No response body');
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const current = attempt === 0
+          ? response
+          : await fetch(`${api.defaults.baseURL}/api/chat/stream/${streamId}`, {
+              headers: { ...headers, 'Last-Event-ID': String(state.lastEventId) },
+            });
+        if (!current.ok) throw new Error(`Stream failed: ${current.status}`);
+        await readEvents(current, state, onChunk);
+      } catch (error) {
+        if (!streamId || attempt >= MAX_RESUME_ATTEMPTS) throw error;
+      }
+      if (state.finished) {
+        if (state.error) throw new Error(state.error);
+        return;
+      }
+      if (!streamId || attempt >= MAX_RESUME_ATTEMPTS) {
+        throw new Error('Stream ended before completion');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+    }
+  },
+};
 
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
+const MAX_RESUME_ATTEMPTS = 3;
 
-      const text = decoder.decode(value);
-      const lines = text.split('\n');
+interface StreamState {
+  lastEventId: number;
+  finished: boolean;
+  error?: string;
+}
 
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const content = line.slice(6);
-          if (content !== '[DONE]' && !content.startsWith('[ERROR]')) {
-            onChunk(content);
-          }
-        }
+async function readEvents(
+  response: Response,
+  state: StreamState,
+  onChunk: (chunk: string) => void
+): Promise<void> {
+  const reader = response.body?.getReader();
+  const decoder = new TextDecoder();
+
+  if (!reader) throw new Error('No response body');
+
+  // 事件以空行分隔，可能跨多个网络分片
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) return;
+
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop() ?? '';
+
+    for (const event of events) {
+      let id: number | null = null;
+      const data: string[] = [];
+      for (const line of event.split('\n')) {
+        if (line.startsWith('id: ')) id = Number(line.slice(4));
+        else if (line.startsWith('data: ')) data.push(line.slice(6));
       }
+      if (id !== null) state.lastEventId = id;
+
+      const content = data.join('\n');
+      if (content === '[DONE]') {
+        state.finished = true;
+        return;
+      }
+      if (content.startsWith('[ERROR]')) {
+        state.finished = true;
+        state.error = content.slice(8);
+        return;
+      }
+      onChunk(content);
     }
-  },
-};
+  }
+}
@@ -24,6 +24,11 @@ export interface Message {
   timestamp: string;
 }
 
+export interface HistoryPage {
+  messages: Message[];
+  hasMore: boolean;
+}
+
 export interface ReminderSchedule {
   scheduled_time: string;
   question: string;